@@ -1,3 +1,6 @@
 from django.contrib import admin
+from .models import DashboardSnapshot
 
-# Register your models here.
+@admin.register(DashboardSnapshot)
+class DashboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('refreshed_at', 'total_users', 'total_content', 'total_progress_items', 'completed_items')
@@ -0,0 +1,119 @@
+"""
+Time-bucketed analytics series for the admin API.
+
+Every series is a single grouped query using the database-portable Trunc*
+functions, served by an index on the bucketed column. Progress analytics
+read the append-only ProgressEvent log rather than the live Progress
+table. Buckets without any rows are filled in with zeros so clients can
+chart the series directly.
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def registrations(start, bucket):
+    User = get_user_model()
+    return User.objects.filter(date_joined__gte=start).annotate(
+        period=BUCKETS[bucket]('date_joined')
+    ).values('period').annotate(count=Count('id')).order_by('period')
+
+
+def completions(start, bucket):
+    from progress.models import ProgressEvent
+    return ProgressEvent.objects.filter(completed=True, created_at__gte=start).annotate(
+        period=BUCKETS[bucket]('created_at')
+    ).values('period').annotate(count=Count('id')).order_by('period')
+
+
+def active_users(start, bucket):
+    from progress.models import ProgressEvent
+    return ProgressEvent.objects.filter(created_at__gte=start).annotate(
+        period=BUCKETS[bucket]('created_at')
+    ).values('period').annotate(count=Count('user', distinct=True)).order_by('period')
+
+
+SERIES = {
+    'registrations': registrations,
+    'completions': completions,
+    'active_users': active_users,
+}
+
+
+def bucket_start(moment, bucket):
+    """
+    Truncate a date the same way the database Trunc functions do
+    """
+    day = moment.date() if hasattr(moment, 'date') else moment
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def build_series(name, days, bucket):
+    """
+    Return [{'period': date, 'count': n}, ...] covering the last `days` days
+    """
+    now = timezone.localtime()
+    start = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    counts = {
+        bucket_start(timezone.localtime(row['period']), bucket): row['count']
+        for row in SERIES[name](start, bucket)
+    }
+
+    series = []
+    period, last = bucket_start(start, bucket), bucket_start(now, bucket)
+    while period <= last:
+        series.append({'period': period, 'count': counts.get(period, 0)})
+        period = next_bucket(period, bucket)
+    return series
+
+
+def cohort_retention(weeks):
+    """
+    Return weekly signup cohorts with the number of their users active in
+    each week since signup, from one grouped query over the event log
+    """
+    from progress.models import ProgressEvent
+
+    User = get_user_model()
+    start = bucket_start(timezone.localtime() - timedelta(weeks=weeks - 1), 'week')
+    sizes = {
+        bucket_start(timezone.localtime(row['cohort']), 'week'): row['count']
+        for row in User.objects.filter(date_joined__date__gte=start).annotate(
+            cohort=TruncWeek('date_joined')
+        ).values('cohort').annotate(count=Count('id'))
+    }
+    active = ProgressEvent.objects.filter(user__date_joined__date__gte=start).annotate(
+        cohort=TruncWeek('user__date_joined'),
+        period=TruncWeek('created_at'),
+    ).values('cohort', 'period').annotate(count=Count('user', distinct=True))
+
+    cohorts = {cohort: {'cohort': cohort, 'size': size, 'active': []} for cohort, size in sizes.items()}
+    for row in active:
+        cohort = bucket_start(timezone.localtime(row['cohort']), 'week')
+        period = bucket_start(timezone.localtime(row['period']), 'week')
+        if cohort in cohorts:
+            cohorts[cohort]['active'].append({'week': (period - cohort).days // 7, 'count': row['count']})
+    for cohort in cohorts.values():
+        cohort['active'].sort(key=lambda point: point['week'])
+    return [cohorts[cohort] for cohort in sorted(cohorts)]
@@ -0,0 +1,93 @@
+"""
+Streaming NDJSON exports of the catalog, users and progress.
+
+Each dataset is read with `.values().iterator(chunk_size=...)`, which
+uses a server-side cursor on PostgreSQL, and encoded one chunk of rows
+at a time. Only one chunk is in memory at any point, whatever the size
+of the table. `gzip_stream` compresses such a stream on the fly. The
+export_data command and AdminExportView both stream from here.
+
+Under ASGI a streaming response must be fed by an async iterator, or
+Django reads the whole stream into memory first, so AdminExportView uses
+the `a`-prefixed versions there.
+"""
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+
+from progress.models import Progress
+from topics.models import Topic, Content
+
+User = get_user_model()
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# Exported fields of each dataset
+DATASETS = {
+    'topics': (Topic, [
+        'id', 'parent_id', 'title', 'description', 'order', 'path', 'total_items', 'created_at', 'updated_at',
+    ]),
+    'contents': (Content, [
+        'id', 'topic_id', 'title', 'content_type', 'url', 'description', 'order', 'created_at', 'updated_at',
+    ]),
+    # Never the password hash
+    'users': (User, [
+        'id', 'username', 'email', 'first_name', 'last_name', 'bio', 'is_active', 'is_staff', 'date_joined',
+        'last_login',
+    ]),
+    'progress': (Progress, [
+        'id', 'user_id', 'content_id', 'completed', 'completed_at', 'created_at', 'updated_at',
+    ]),
+}
+
+
+def export_ndjson(dataset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a dataset as NDJSON bytes, one chunk of rows per item
+    """
+    model, fields = DATASETS[dataset]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines = []
+    for row in model.objects.order_by('pk').values(*fields).iterator(chunk_size=chunk_size):
+        lines.append(encoder.encode(row))
+        if len(lines) >= chunk_size:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+async def aexport_ndjson(dataset, chunk_size=DEFAULT_CHUNK_SIZE):
+    model, fields = DATASETS[dataset]
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    lines = []
+    async for row in model.objects.order_by('pk').values(*fields).aiterator(chunk_size=chunk_size):
+        lines.append(encoder.encode(row))
+        if len(lines) >= chunk_size:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Gzip a stream of bytes chunks as they are produced
+    """
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def agzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
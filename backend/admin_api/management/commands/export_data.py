@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from admin_api.export import DATASETS, DEFAULT_CHUNK_SIZE, export_ndjson, gzip_stream
+
+
+class Command(BaseCommand):
+    help = 'Stream a table (topics, contents, users or progress) as NDJSON, optionally gzip-compressed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('--output', help='File to write to instead of standard output')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched and written at a time')
+
+    def handle(self, *args, **options):
+        chunks = export_ndjson(options['dataset'], options['chunk_size'])
+        if options['gzip']:
+            chunks = gzip_stream(chunks)
+
+        if options['output'] is None:
+            self.write(chunks, sys.stdout.buffer)
+            return
+        with open(options['output'], 'wb') as f:
+            written = self.write(chunks, f)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes of {options['dataset']} to {options['output']}"))
+
+    def write(self, chunks, out):
+        written = 0
+        for chunk in chunks:
+            out.write(chunk)
+            written += len(chunk)
+        out.flush()
+        return written
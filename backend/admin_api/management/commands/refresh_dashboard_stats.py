@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from admin_api.models import DashboardSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Recompute the admin dashboard statistics snapshot (run on a schedule)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=0,
+            help='Skip the refresh if the latest snapshot is younger than this many seconds'
+        )
+
+    def handle(self, *args, **options):
+        latest = DashboardSnapshot.objects.order_by('-refreshed_at').first()
+        if latest and latest.age < timedelta(seconds=options['max_age']):
+            self.stdout.write(f"Snapshot from {latest.refreshed_at} is fresh enough, skipping")
+            return
+
+        started = timezone.now()
+        snapshot = DashboardSnapshot.refresh()
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed dashboard statistics in {elapsed:.2f}s "
+            f"({snapshot.total_users} users, {snapshot.total_progress_items} progress items)"
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_users', models.IntegerField(default=0)),
+                ('active_users', models.IntegerField(default=0)),
+                ('active_users_30d', models.IntegerField(default=0)),
+                ('total_topics', models.IntegerField(default=0)),
+                ('total_content', models.IntegerField(default=0)),
+                ('total_progress_items', models.IntegerField(default=0)),
+                ('completed_items', models.IntegerField(default=0)),
+                ('registration_by_month', models.JSONField(default=list)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'get_latest_by': 'refreshed_at',
+            },
+        ),
+    ]
@@ -1,3 +1,99 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+class DashboardSnapshot(models.Model):
+    """
+    Precomputed admin dashboard statistics.
+
+    Counting the user, content and progress tables on every dashboard load
+    gets slower as they grow, so the counts are computed by the
+    refresh_dashboard_stats command (or a forced refresh) and the
+    dashboard views only read the latest snapshot.
+    """
+    total_users = models.IntegerField(default=0)
+    active_users = models.IntegerField(default=0)
+    active_users_30d = models.IntegerField(default=0)
+    total_topics = models.IntegerField(default=0)
+    total_content = models.IntegerField(default=0)
+    total_progress_items = models.IntegerField(default=0)
+    completed_items = models.IntegerField(default=0)
+    registration_by_month = models.JSONField(default=list)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        get_latest_by = 'refreshed_at'
+
+    def __str__(self):
+        return f"Dashboard statistics at {self.refreshed_at}"
+
+    @property
+    def completion_rate(self):
+        if self.total_progress_items == 0:
+            return 0
+        return self.completed_items / self.total_progress_items * 100
+
+    @property
+    def age(self):
+        return timezone.now() - self.refreshed_at
+
+    @property
+    def is_stale(self):
+        return self.age > timedelta(seconds=settings.DASHBOARD_STATS_MAX_AGE)
+
+    @classmethod
+    def current(cls):
+        """
+        Return the latest snapshot, computing the first one if none exists
+        """
+        snapshot = cls.objects.order_by('-refreshed_at').first()
+        return snapshot or cls.refresh()
+
+    @classmethod
+    def refresh(cls):
+        """
+        Compute a new snapshot and drop the older ones
+        """
+        from progress.models import Progress, OverallProgress
+        from topics.catalog import get_catalog_size
+        from topics.models import Topic
+
+        User = get_user_model()
+        now = timezone.now()
+
+        users = User.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            active_30d=Count('id', filter=Q(last_login__gte=now - timedelta(days=30))),
+        )
+        registrations = (
+            User.objects.filter(date_joined__gte=now - timedelta(days=180))
+            .annotate(month=TruncMonth('date_joined'))
+            .values('month')
+            .annotate(count=Count('id'))
+            .order_by('month')
+        )
 
-# Create your models here.
+        snapshot = cls.objects.create(
+            total_users=users['total'],
+            active_users=users['active'],
+            active_users_30d=users['active_30d'],
+            total_topics=Topic.objects.count(),
+            total_content=get_catalog_size(),
+            total_progress_items=Progress.objects.count(),
+            # Completions come from the maintained per-user counters rather
+            # than a scan of the Progress table
+            completed_items=OverallProgress.objects.aggregate(total=Sum('total_completed'))['total'] or 0,
+            registration_by_month=[
+                {'month': row['month'].strftime('%Y-%m'), 'count': row['count']}
+                for row in registrations
+            ],
+            refreshed_at=now,
+        )
+        cls.objects.filter(refreshed_at__lt=now).delete()
+        return snapshot
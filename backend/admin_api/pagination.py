@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class AdminUserCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the admin user list, newest users first.
+
+    The cursor encodes the last date_joined seen, so every page is a
+    bounded index range scan however deep the client pages.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-date_joined', '-id')
@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from takeyouforward.middleware import TimedSerializerMixin
 from topics.models import Topic, Content
 from progress.models import Progress, OverallProgress
 
 User = get_user_model()
 
-class AdminUserSerializer(serializers.ModelSerializer):
+class AdminUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for User model with admin-specific fields
     """
@@ -22,31 +23,31 @@ class AdminUserSerializer(serializers.ModelSerializer):
             'progress_percentage', 'completed_items', 'total_items', 'last_activity'
         ]
     
-    def get_progress_percentage(self, obj):
+    def get_overall_progress(self, obj):
+        # The view select_related()s overall_progress, so a missing row is
+        # known without another query
         try:
-            return obj.overall_progress.get_percentage()
+            return obj.overall_progress
         except OverallProgress.DoesNotExist:
-            return 0
+            return None
+    
+    def get_progress_percentage(self, obj):
+        overall = self.get_overall_progress(obj)
+        return overall.get_percentage() if overall else 0
     
     def get_completed_items(self, obj):
-        try:
-            return obj.overall_progress.total_completed
-        except OverallProgress.DoesNotExist:
-            return 0
+        overall = self.get_overall_progress(obj)
+        return overall.total_completed if overall else 0
     
     def get_total_items(self, obj):
-        try:
-            return obj.overall_progress.total_items
-        except OverallProgress.DoesNotExist:
-            return 0
+        overall = self.get_overall_progress(obj)
+        return overall.total_items if overall else 0
     
     def get_last_activity(self, obj):
-        try:
-            return obj.overall_progress.last_activity
-        except OverallProgress.DoesNotExist:
-            return None
+        overall = self.get_overall_progress(obj)
+        return overall.last_activity if overall else None
 
-class AdminTopicSerializer(serializers.ModelSerializer):
+class AdminTopicSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Topic model with admin-specific fields
     """
@@ -57,16 +58,22 @@ class AdminTopicSerializer(serializers.ModelSerializer):
         model = Topic
         fields = [
             'id', 'title', 'description', 'order', 'parent', 'parent_title',
-            'total_items', 'content_count', 'created_at', 'updated_at'
+            'path', 'total_items', 'content_count', 'created_at', 'updated_at'
         ]
     
+    def validate_parent(self, parent):
+        # Moving a topic into its own subtree would create a cycle
+        if parent and self.instance and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A topic cannot be moved under itself or one of its subtopics.")
+        return parent
+    
     def get_parent_title(self, obj):
         return obj.parent.title if obj.parent else None
     
     def get_content_count(self, obj):
         return obj.contents.count()
 
-class AdminContentSerializer(serializers.ModelSerializer):
+class AdminContentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Content model with admin-specific fields
     """
@@ -82,7 +89,7 @@ class AdminContentSerializer(serializers.ModelSerializer):
     def get_topic_title(self, obj):
         return obj.topic.title
 
-class AdminDashboardSerializer(serializers.Serializer):
+class AdminDashboardSerializer(TimedSerializerMixin, serializers.Serializer):
     """
     Serializer for admin dashboard statistics
     """
@@ -92,3 +99,5 @@ class AdminDashboardSerializer(serializers.Serializer):
     total_content = serializers.IntegerField()
     recent_users = AdminUserSerializer(many=True)
     recent_content = AdminContentSerializer(many=True)
+    stats_refreshed_at = serializers.DateTimeField()
+    stats_stale = serializers.BooleanField()
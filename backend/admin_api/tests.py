@@ -1,3 +1,434 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from progress.models import Progress, OverallProgress, ProgressEvent
+from takeyouforward.queryplan import QueryPlanAssertions, analyze
+from topics.models import Topic, Content
+from .export import export_ndjson
+from .models import DashboardSnapshot
+
+User = get_user_model()
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+class AdminAPITestCase(APITestCase):
+    """
+    Shared fixtures for the admin endpoint tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        self.client.force_authenticate(user=self.admin)
+
+class AdminTopicTreeTests(AdminAPITestCase):
+    """
+    Tests for keeping the topic path index current through the admin API
+    """
+    def test_create_move_and_delete(self):
+        response = self.client.post(reverse('admin-topics'), {'title': 'Root', 'order': 1}, format='json')
+        root = Topic.objects.get(pk=response.data['id'])
+        response = self.client.post(reverse('admin-topics'), {'title': 'Child', 'parent': root.pk}, format='json')
+        child = Topic.objects.get(pk=response.data['id'])
+        leaf = Topic.objects.create(title='Leaf', parent=child)
+        other = Topic.objects.create(title='Other')
+
+        self.assertEqual(child.path, f"{root.pk}/{child.pk}/")
+
+        response = self.client.patch(reverse('admin-topic-detail', args=[child.pk]), {'parent': other.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        leaf.refresh_from_db()
+        self.assertEqual(leaf.path, f"{other.pk}/{child.pk}/{leaf.pk}/")
+
+        self.client.delete(reverse('admin-topic-detail', args=[child.pk]))
+        self.assertEqual(list(other.get_descendants()), [])
+
+    def test_cannot_move_topic_into_its_subtree(self):
+        root = Topic.objects.create(title='Root')
+        child = Topic.objects.create(title='Child', parent=root)
+
+        response = self.client.patch(reverse('admin-topic-detail', args=[root.pk]), {'parent': child.pk}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        root.refresh_from_db()
+        self.assertIsNone(root.parent_id)
+
+class AdminContentCounterTests(AdminAPITestCase):
+    """
+    Tests for the automatically maintained Topic.total_items
+    """
+    def setUp(self):
+        super().setUp()
+        self.root = Topic.objects.create(title='Root')
+        self.first = Topic.objects.create(title='First', parent=self.root)
+        self.second = Topic.objects.create(title='Second', parent=self.root)
+
+    def create_content(self, topic):
+        response = self.client.post(reverse('admin-content'), {
+            'topic': topic.pk,
+            'title': 'Lesson',
+            'content_type': 'video',
+            'url': 'https://example.com/video',
+        }, format='json')
+        return response.data['id']
+
+    def totals(self):
+        return {
+            topic.title: topic.total_items
+            for topic in Topic.objects.filter(pk__in=[self.root.pk, self.first.pk, self.second.pk])
+        }
+
+    def test_totals_follow_create_move_and_delete(self):
+        first_id = self.create_content(self.first)
+        self.create_content(self.first)
+        self.assertEqual(self.totals(), {'Root': 2, 'First': 2, 'Second': 0})
+
+        self.client.patch(reverse('admin-content-detail', args=[first_id]), {'topic': self.second.pk}, format='json')
+        self.assertEqual(self.totals(), {'Root': 2, 'First': 1, 'Second': 1})
+
+        self.client.delete(reverse('admin-content-detail', args=[first_id]))
+        self.assertEqual(self.totals(), {'Root': 1, 'First': 1, 'Second': 0})
+
+    def test_moving_a_topic_moves_its_items(self):
+        self.create_content(self.first)
+        other = Topic.objects.create(title='Other')
+
+        self.client.patch(reverse('admin-topic-detail', args=[self.first.pk]), {'parent': other.pk}, format='json')
+
+        self.assertEqual(self.totals()['Root'], 0)
+        other.refresh_from_db()
+        self.assertEqual(other.total_items, 1)
+
+    def test_total_items_is_read_only(self):
+        response = self.client.patch(reverse('admin-topic-detail', args=[self.root.pk]), {'total_items': 50}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.totals()['Root'], 0)
+
+class AdminConditionalGetTests(AdminAPITestCase):
+    """
+    Tests for conditional GETs on the admin catalog lists
+    """
+    def test_admin_lists_honour_if_none_match(self):
+        Topic.objects.create(title='Root')
+        for name in ('admin-topics', 'admin-content'):
+            etag = self.client.get(reverse(name))['ETag']
+            self.assertEqual(self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Topic.objects.create(title='Second')
+        self.assertEqual(self.client.get(reverse('admin-topics'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+class AdminUserListTests(AdminAPITestCase):
+    """
+    Tests for the paginated admin user list
+    """
+    def setUp(self):
+        super().setUp()
+        for i in range(12):
+            user = User.objects.create_user(username=f"learner{i:02}", email=f"learner{i:02}@example.com", password='pass12345')
+            if i % 2:
+                OverallProgress.objects.create(user=user, total_completed=i, total_items=20)
+
+    def test_pages_through_all_users_with_bounded_queries(self):
+        seen = []
+        url = reverse('admin-users') + '?page_size=5'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            seen.extend(user['username'] for user in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(len(seen), 13)
+        self.assertEqual(len(set(seen)), 13)
+
+    def test_search_and_filters(self):
+        response = self.client.get(reverse('admin-users'), {'search': 'learner1'})
+        self.assertEqual({user['username'] for user in response.data['results']}, {'learner10', 'learner11'})
+
+        response = self.client.get(reverse('admin-users'), {'is_staff': 'true'})
+        self.assertEqual([user['username'] for user in response.data['results']], ['staff'])
+
+        response = self.client.get(reverse('admin-users'), {'search': 'learner11@'})
+        self.assertEqual(response.data['results'][0]['completed_items'], 11)
+        self.assertEqual(response.data['results'][0]['progress_percentage'], 55)
+
+class DashboardSnapshotTests(AdminAPITestCase):
+    """
+    Tests for the precomputed dashboard statistics
+    """
+    def test_dashboard_reads_snapshot_until_refreshed(self):
+        call_command('refresh_dashboard_stats', stdout=StringIO())
+        User.objects.create_user(username='newcomer', password='pass12345')
+
+        response = self.client.get(reverse('admin-dashboard'))
+        self.assertEqual(response.data['total_users'], 1)
+        self.assertFalse(response.data['stats_stale'])
+        self.assertIn('stats_refreshed_at', response.data)
+
+        response = self.client.get(reverse('admin-dashboard'), {'refresh': 'true'})
+        self.assertEqual(response.data['total_users'], 2)
+        self.assertEqual(DashboardSnapshot.objects.count(), 1)
+
+    def test_query_count_does_not_depend_on_progress_volume(self):
+        topic = Topic.objects.create(title='Root')
+        content = Content.objects.create(topic=topic, title='Lesson', content_type='video', url='https://example.com/v')
+        Progress.objects.create(user=self.admin, content=content, completed=True)
+        OverallProgress.record_change(self.admin)
+        DashboardSnapshot.refresh()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('admin-user-stats'))
+        self.assertEqual(response.data['completed_items'], 1)
+        self.assertEqual(response.data['completion_rate'], 100)
+        self.assertEqual(response.data['registration_by_month'][0]['count'], 1)
+
+    def test_refresh_recounts_progress(self):
+        topic = Topic.objects.create(title='Root')
+        contents = [
+            Content.objects.create(topic=topic, title=f"Lesson {i}", content_type='video', url='https://example.com/v')
+            for i in range(3)
+        ]
+        Progress.objects.create(id=100, user=self.admin, content=contents[0])
+        DashboardSnapshot.refresh()
+
+        # A row whose transaction committed after a higher id was counted,
+        # and a row removed by a cascade
+        Progress.objects.create(id=50, user=self.admin, content=contents[1])
+        Progress.objects.create(user=self.admin, content=contents[2])
+        contents[2].delete()
+
+        self.assertEqual(DashboardSnapshot.refresh().total_progress_items, 2)
+
+    def test_snapshot_goes_stale(self):
+        DashboardSnapshot.refresh()
+        DashboardSnapshot.objects.update(refreshed_at=timezone.now() - timedelta(days=1))
+
+        self.assertTrue(self.client.get(reverse('admin-user-stats')).data['stats_stale'])
+
+class AdminAnalyticsTests(AdminAPITestCase):
+    """
+    Tests for the time-bucketed analytics series
+    """
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        topic = Topic.objects.create(title='Root')
+        content = Content.objects.create(topic=topic, title='Lesson', content_type='video', url='https://example.com/v')
+        for days_ago in (0, 0, 2):
+            user = User.objects.create_user(username=f"user{User.objects.count()}", password='pass12345')
+            User.objects.filter(pk=user.pk).update(date_joined=now - timedelta(days=days_ago))
+            ProgressEvent.objects.create(user=user, content=content, completed=True, created_at=now - timedelta(days=days_ago))
+        User.objects.filter(pk=self.admin.pk).update(date_joined=now - timedelta(days=60))
+
+    def test_daily_series_fill_empty_days(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('admin-analytics'), {'days': 7})
+
+        self.assertEqual(response.status_code, 200)
+        registrations = response.data['series']['registrations']
+        self.assertEqual(len(registrations), 7)
+        self.assertEqual([point['count'] for point in registrations][-3:], [1, 0, 2])
+        self.assertEqual(sum(point['count'] for point in response.data['series']['completions']), 3)
+        self.assertEqual([point['count'] for point in response.data['series']['active_users']][-3:], [1, 0, 2])
+
+    def test_monthly_buckets_and_series_selection(self):
+        response = self.client.get(reverse('admin-analytics'), {'series': 'registrations', 'bucket': 'month', 'days': 90})
+
+        self.assertEqual(list(response.data['series']), ['registrations'])
+        self.assertEqual(sum(point['count'] for point in response.data['series']['registrations']), 4)
+        self.assertTrue(all(point['period'].day == 1 for point in response.data['series']['registrations']))
+
+    def test_rejects_invalid_parameters(self):
+        for params in ({'series': 'revenue'}, {'bucket': 'year'}, {'days': 0}, {'days': 'x'}):
+            self.assertEqual(self.client.get(reverse('admin-analytics'), params).status_code, 400)
+
+    def test_cohort_retention(self):
+        response = self.client.get(reverse('admin-cohorts'), {'weeks': 4})
+
+        self.assertEqual(response.status_code, 200)
+        cohorts = response.data['cohorts']
+        self.assertEqual(sum(cohort['size'] for cohort in cohorts), 3)
+        self.assertEqual(sum(point['count'] for cohort in cohorts for point in cohort['active']), 3)
+        self.assertTrue(all(point['week'] == 0 for cohort in cohorts for point in cohort['active']))
+
+class CatalogImportTests(AdminAPITestCase):
+    """
+    Tests for the bulk catalog import endpoint and command
+    """
+    csv = (
+        "type,id,parent,title,order,content_type,url\n"
+        "topic,algebra,,Algebra,1,,\n"
+        "content,algebra-intro,algebra,Intro,1,video,https://example.com/v\n"
+    )
+
+    def test_json_body_and_csv_upload(self):
+        response = self.client.post(reverse('admin-import'), [{'id': 'calculus', 'title': 'Calculus'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['topics'], {'created': 1, 'updated': 0})
+
+        upload = SimpleUploadedFile('catalog.csv', self.csv.encode(), content_type='text/csv')
+        response = self.client.post(reverse('admin-import'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['contents'], {'created': 1, 'updated': 0})
+        self.assertEqual(Topic.objects.get(external_id='algebra').total_items, 1)
+
+    def test_reports_every_invalid_row(self):
+        response = self.client.post(reverse('admin-import'), [
+            {'id': 'algebra', 'title': '', 'contents': [{'id': 'x', 'title': 'X', 'content_type': 'song', 'url': 'x'}]},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.data['errors']), 3)
+        self.assertFalse(Topic.objects.exists())
+
+    def test_is_admin_only(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='learner', password='pass12345'))
+        response = self.client.post(reverse('admin-import'), [{'id': 'calculus', 'title': 'Calculus'}], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_command_dry_run_rolls_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.csv')
+            with open(path, 'w') as f:
+                f.write(self.csv)
+            call_command('import_catalog', path, dry_run=True, stdout=StringIO())
+            self.assertFalse(Topic.objects.exists())
+            call_command('import_catalog', path, stdout=StringIO())
+        self.assertEqual(Content.objects.get(external_id='algebra-intro').topic.external_id, 'algebra')
+
+class AdminReorderTests(AdminAPITestCase):
+    """
+    Tests for the bulk reorder endpoints
+    """
+    def setUp(self):
+        super().setUp()
+        self.parent = Topic.objects.create(title='Parent', order=1)
+        self.children = [Topic.objects.create(title=f"Child {i}", order=i, parent=self.parent) for i in range(3)]
+        self.contents = [
+            Content.objects.create(topic=self.parent, title=f"Content {i}", content_type='video', url='https://example.com/v', order=i)
+            for i in range(3)
+        ]
+
+    def test_reorders_topics_and_contents(self):
+        ids = [t.pk for t in self.children][::-1]
+        response = self.client.post(reverse('admin-topic-reorder'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['orders']], ids)
+        self.assertEqual(list(self.parent.subtopics.order_by('order').values_list('id', flat=True)), ids)
+
+        ids = [c.pk for c in self.contents][1:] + [self.contents[0].pk]
+        response = self.client.post(reverse('admin-content-reorder'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.parent.contents.order_by('order').values_list('id', flat=True)), ids)
+
+    def test_rejects_invalid_ids(self):
+        for data in ({}, {'ids': 'x'}, {'ids': [self.children[0].pk]}, {'ids': [c.pk for c in self.contents]}):
+            response = self.client.post(reverse('admin-topic-reorder'), data, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.data)
+
+    def test_is_admin_only(self):
+        self.client.force_authenticate(user=User.objects.create_user(username='learner', password='pass12345'))
+        response = self.client.post(reverse('admin-content-reorder'), {'ids': [c.pk for c in self.contents]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+class ExportTests(AdminAPITestCase):
+    """
+    Tests for the streaming NDJSON exports
+    """
+    def setUp(self):
+        super().setUp()
+        self.topic = Topic.objects.create(title='Root')
+        for i in range(5):
+            Content.objects.create(topic=self.topic, title=f"Lesson {i}", content_type='video', url='https://example.com/v', order=i)
+
+    def rows(self, body):
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    def test_streams_rows_in_chunks(self):
+        chunks = list(export_ndjson('contents', chunk_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        rows = self.rows(b''.join(chunks))
+        self.assertEqual([row['title'] for row in rows], [f"Lesson {i}" for i in range(5)])
+        self.assertEqual(rows[0]['topic_id'], self.topic.pk)
+
+    def test_endpoint_streams_plain_and_gzip(self):
+        response = self.client.get(reverse('admin-export', args=['users']))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        users = self.rows(b''.join(response.streaming_content))
+        self.assertEqual([user['username'] for user in users], ['staff'])
+        self.assertNotIn('password', users[0])
+
+        response = self.client.get(reverse('admin-export', args=['contents']), {'gzip': '1'})
+        self.assertIn('contents.ndjson.gz', response['Content-Disposition'])
+        self.assertEqual(len(self.rows(gzip.decompress(b''.join(response.streaming_content)))), 5)
+
+    async def test_endpoint_streams_asynchronously_under_asgi(self):
+        token = await Token.objects.acreate(user=self.admin)
+        response = await AsyncClient().get(
+            reverse('admin-export', args=['contents']), {'gzip': '1'}, headers={'Authorization': f"Token {token.key}"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(self.rows(gzip.decompress(body))), 5)
+
+    def test_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get(reverse('admin-export', args=['passwords'])).status_code, 404)
+        learner = User.objects.create_user(username='learner', password='pass12345')
+        self.client.force_authenticate(user=learner)
+        self.assertEqual(self.client.get(reverse('admin-export', args=['users'])).status_code, 403)
+
+    def test_command_writes_gzip_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'topics.ndjson.gz')
+            call_command('export_data', 'topics', output=path, gzip=True, stdout=StringIO())
+            with gzip.open(path) as f:
+                topics = self.rows(f.read())
+
+        self.assertEqual(topics[0]['path'], self.topic.path)
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    Tests that the admin read paths are served by indexes
+    """
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        User.objects.bulk_create([
+            User(username=f"user{i}", date_joined=now - timedelta(hours=i), last_login=now - timedelta(days=i % 90))
+            for i in range(1000)
+        ])
+        topics = [Topic.objects.create(title=f"Topic {i}", order=i) for i in range(50)]
+        Content.objects.bulk_create([
+            Content(topic=topic, title=f"Content {i}", content_type='video', url='https://example.com/video', order=i)
+            for topic in topics
+            for i in range(10)
+        ])
+        analyze()
+
+    def test_user_list_page(self):
+        self.assertIndexed(User.objects.order_by('-date_joined', '-id')[:50], index_walks=True)
+
+    def test_recently_active_users(self):
+        self.assertIndexed(User.objects.filter(last_login__gte=timezone.now() - timedelta(days=30)))
+
+    def test_recent_content(self):
+        self.assertIndexed(Content.objects.select_related('topic').order_by('-created_at')[:5], index_walks=True)
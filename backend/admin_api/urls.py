@@ -5,9 +5,15 @@ from .views import (
     AdminUserListView,
     AdminTopicListCreateView,
     AdminTopicDetailView,
+    AdminTopicReorderView,
     AdminContentListCreateView,
     AdminContentDetailView,
-    AdminUserStatsView
+    AdminContentReorderView,
+    AdminUserStatsView,
+    AdminAnalyticsView,
+    AdminCohortView,
+    AdminCatalogImportView,
+    AdminExportView
 )
 
 urlpatterns = [
@@ -16,7 +22,13 @@ urlpatterns = [
     path('users/', AdminUserListView.as_view(), name='admin-users'),
     path('topics/', AdminTopicListCreateView.as_view(), name='admin-topics'),
     path('topics/<int:pk>/', AdminTopicDetailView.as_view(), name='admin-topic-detail'),
+    path('topics/reorder/', AdminTopicReorderView.as_view(), name='admin-topic-reorder'),
     path('content/', AdminContentListCreateView.as_view(), name='admin-content'),
     path('content/<int:pk>/', AdminContentDetailView.as_view(), name='admin-content-detail'),
+    path('content/reorder/', AdminContentReorderView.as_view(), name='admin-content-reorder'),
     path('user-stats/', AdminUserStatsView.as_view(), name='admin-user-stats'),
+    path('analytics/', AdminAnalyticsView.as_view(), name='admin-analytics'),
+    path('analytics/cohorts/', AdminCohortView.as_view(), name='admin-cohorts'),
+    path('import/', AdminCatalogImportView.as_view(), name='admin-import'),
+    path('export/<str:dataset>/', AdminExportView.as_view(), name='admin-export'),
 ]
@@ -1,14 +1,28 @@
-from rest_framework import generics, permissions, status
+import json
+import logging
+
+from rest_framework import filters, generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.contrib.auth import get_user_model, authenticate
-from django.db.models import Count
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.authtoken.models import Token
 
+from takeyouforward.conditional import ConditionalGetMixin
+from topics.catalog import get_catalog_states
+from topics.importer import CatalogImportError, import_catalog, parse_csv, parse_tree
+from topics.ordering import ReorderError, reorder
 from topics.models import Topic, Content
-from progress.models import Progress, OverallProgress
+from users.login import LoginError, authenticate_login
+from users.tokens import signed_tokens
+from . import analytics
+from .export import DATASETS, aexport_ndjson, agzip_stream, export_ndjson, gzip_stream
+from .models import DashboardSnapshot
+from .pagination import AdminUserCursorPagination
 from .serializers import (
     AdminUserSerializer,
     AdminTopicSerializer,
@@ -17,6 +31,7 @@ from .serializers import (
 )
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 class IsAdminUser(permissions.BasePermission):
     """
@@ -30,6 +45,18 @@ class AdminLoginView(APIView):
     Custom login view for admin users
     """
     permission_classes = [permissions.AllowAny]
+    # Accounts that may be created on first login in development
+    bootstrap_usernames = ('admin', 'prakhar')
+
+    def create_admin(self, username, password):
+        if username.lower() not in self.bootstrap_usernames:
+            return None
+        logger.warning("Creating development admin user %s", username)
+        return User.objects.create_superuser(
+            username=username,
+            email=f"{username}@example.com" if '@' not in username else username,
+            password=password
+        )
 
     def post(self, request):
         username = request.data.get('username')
@@ -39,56 +66,12 @@ class AdminLoginView(APIView):
             return Response({'error': 'Please provide both username and password'},
                            status=status.HTTP_400_BAD_REQUEST)
 
-        # Try to authenticate with username
-        user = authenticate(username=username, password=password)
-
-        # If that fails, try with email
-        if not user:
-            try:
-                user_obj = User.objects.get(email=username)
-                user = authenticate(username=user_obj.username, password=password)
-            except User.DoesNotExist:
-                user = None
-
-        # If authentication failed, try to create/update the admin user
-        if not user:
-            # For development purposes, we'll create or update the admin user
-            # In production, you would remove this code
-            try:
-                # Check if the user exists by username or email
-                try:
-                    user = User.objects.get(username=username)
-                except User.DoesNotExist:
-                    try:
-                        user = User.objects.get(email=username)
-                    except User.DoesNotExist:
-                        # Create a new admin user if requested username is 'admin'
-                        if username.lower() == 'admin' or username.lower() == 'prakhar':
-                            user = User.objects.create_superuser(
-                                username=username,
-                                email=f"{username}@example.com" if '@' not in username else username,
-                                password=password
-                            )
-                        else:
-                            return Response({'error': 'Invalid credentials'},
-                                          status=status.HTTP_401_UNAUTHORIZED)
-
-                # Update the password for existing user
-                if user and username.lower() in ['admin', 'prakhar']:
-                    user.set_password(password)
-                    user.is_staff = True
-                    user.is_superuser = True
-                    user.save()
-                    # Re-authenticate with new password
-                    user = authenticate(username=user.username, password=password)
-            except Exception as e:
-                print(f"Error creating/updating admin user: {str(e)}")
-                return Response({'error': f'Authentication error: {str(e)}'},
-                               status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        if not user:
-            return Response({'error': 'Invalid credentials'},
-                           status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            user = authenticate_login(
+                request, username, password, create_missing=self.create_admin if settings.DEBUG else None
+            )
+        except LoginError as e:
+            return e.response()
 
         # Check if user is admin
         if not user.is_staff:
@@ -107,10 +90,21 @@ class AdminLoginView(APIView):
                 'first_name': user.first_name,
                 'last_name': user.last_name,
                 'is_staff': user.is_staff
-            }
+            },
+            **signed_tokens(user)
         })
 
-class AdminDashboardView(APIView):
+class DashboardSnapshotMixin:
+    """
+    Reads the precomputed dashboard statistics; ?refresh=true forces a new
+    snapshot to be computed first
+    """
+    def get_snapshot(self, request):
+        if request.query_params.get('refresh', '').lower() in ('1', 'true'):
+            return DashboardSnapshot.refresh()
+        return DashboardSnapshot.current()
+
+class AdminDashboardView(DashboardSnapshotMixin, APIView):
     """
     View for admin dashboard statistics
     """
@@ -118,35 +112,33 @@ class AdminDashboardView(APIView):
 
     def get(self, request):
         try:
-            print(f"Admin Dashboard request from user: {request.user.username}")
+            logger.debug("Admin dashboard request from user %s", request.user.username)
 
-            # Get basic counts
-            total_users = User.objects.count()
-            active_users = User.objects.filter(is_active=True).count()
-            total_topics = Topic.objects.count()
-            total_content = Content.objects.count()
+            snapshot = self.get_snapshot(request)
 
             # Get recent users (joined in the last 30 days)
-            recent_users = User.objects.filter(
+            recent_users = User.objects.select_related('overall_progress').filter(
                 date_joined__gte=timezone.now() - timedelta(days=30)
             ).order_by('-date_joined')[:5]
 
             # Get recently added content
-            recent_content = Content.objects.order_by('-created_at')[:5]
+            recent_content = Content.objects.select_related('topic').order_by('-created_at')[:5]
 
             data = {
-                'total_users': total_users,
-                'active_users': active_users,
-                'total_topics': total_topics,
-                'total_content': total_content,
-                'recent_users': AdminUserSerializer(recent_users, many=True).data,
-                'recent_content': AdminContentSerializer(recent_content, many=True).data
+                'total_users': snapshot.total_users,
+                'active_users': snapshot.active_users,
+                'total_topics': snapshot.total_topics,
+                'total_content': snapshot.total_content,
+                'recent_users': recent_users,
+                'recent_content': recent_content,
+                'stats_refreshed_at': snapshot.refreshed_at,
+                'stats_stale': snapshot.is_stale,
             }
 
             serializer = AdminDashboardSerializer(data)
             return Response(serializer.data)
         except Exception as e:
-            print(f"Error in AdminDashboardView: {str(e)}")
+            logger.exception("Error in AdminDashboardView")
             return Response(
                 {'error': f'An error occurred: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -154,13 +146,23 @@ class AdminDashboardView(APIView):
 
 class AdminUserListView(generics.ListAPIView):
     """
-    View for listing all users with admin details
+    View for listing users with admin details, one cursor page at a time
     """
-    queryset = User.objects.all().order_by('-date_joined')
     serializer_class = AdminUserSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = AdminUserCursorPagination
+    filter_backends = [filters.SearchFilter]
+    search_fields = ['^username', '^email']
 
-class AdminTopicListCreateView(generics.ListCreateAPIView):
+    def get_queryset(self):
+        queryset = User.objects.select_related('overall_progress')
+        for flag in ('is_active', 'is_staff'):
+            value = self.request.query_params.get(flag)
+            if value is not None:
+                queryset = queryset.filter(**{flag: value.lower() in ('1', 'true')})
+        return queryset
+
+class AdminTopicListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     View for listing and creating topics
     """
@@ -168,6 +170,9 @@ class AdminTopicListCreateView(generics.ListCreateAPIView):
     serializer_class = AdminTopicSerializer
     permission_classes = [IsAdminUser]
 
+    def get_conditional_states(self):
+        return get_catalog_states('admin-topics', lambda: [self.get_queryset()])
+
 class AdminTopicDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     View for retrieving, updating, and deleting a topic
@@ -176,7 +181,7 @@ class AdminTopicDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AdminTopicSerializer
     permission_classes = [IsAdminUser]
 
-class AdminContentListCreateView(generics.ListCreateAPIView):
+class AdminContentListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     View for listing and creating content
     """
@@ -191,6 +196,11 @@ class AdminContentListCreateView(generics.ListCreateAPIView):
             queryset = queryset.filter(topic_id=topic_id)
         return queryset
 
+    def get_conditional_states(self):
+        # The full list or a single topic's contents
+        topic_id = self.request.query_params.get('topic_id', '')
+        return get_catalog_states(f"admin-contents:{topic_id}", lambda: [self.get_queryset()])
+
 class AdminContentDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     View for retrieving, updating, and deleting content
@@ -199,37 +209,157 @@ class AdminContentDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AdminContentSerializer
     permission_classes = [IsAdminUser]
 
-class AdminUserStatsView(APIView):
+class AdminReorderView(APIView):
+    """
+    Base view for reordering sibling items from their ids in the new order
+    """
+    permission_classes = [IsAdminUser]
+    model = None
+    scope_field = None
+
+    def post(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'error': 'ids must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            orders, updated = reorder(self.model, self.scope_field, ids)
+        except ReorderError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'updated': updated, 'orders': [{'id': pk, 'order': order} for pk, order in orders.items()]})
+
+class AdminTopicReorderView(AdminReorderView):
+    """
+    View for reordering all the topics under one parent
+    """
+    model = Topic
+    scope_field = 'parent'
+
+class AdminContentReorderView(AdminReorderView):
+    """
+    View for reordering all the contents of one topic
+    """
+    model = Content
+    scope_field = 'topic'
+
+class AdminUserStatsView(DashboardSnapshotMixin, APIView):
     """
     View for detailed user statistics
     """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        # Get user registration stats by month
-        now = timezone.now()
-        months_ago_6 = now - timedelta(days=180)
-
-        users_by_month = User.objects.filter(
-            date_joined__gte=months_ago_6
-        ).extra(
-            select={'month': "STRFTIME('%Y-%m', date_joined)"}
-        ).values('month').annotate(count=Count('id')).order_by('month')
-
-        # Get progress stats
-        total_progress_items = Progress.objects.count()
-        completed_items = Progress.objects.filter(completed=True).count()
-        completion_rate = (completed_items / total_progress_items * 100) if total_progress_items > 0 else 0
-
-        # Get active users in the last 30 days
-        active_users_30d = User.objects.filter(
-            last_login__gte=now - timedelta(days=30)
-        ).count()
+        snapshot = self.get_snapshot(request)
 
         return Response({
-            'registration_by_month': list(users_by_month),
-            'total_progress_items': total_progress_items,
-            'completed_items': completed_items,
-            'completion_rate': completion_rate,
-            'active_users_30d': active_users_30d
-        })
\ No newline at end of file
+            'registration_by_month': snapshot.registration_by_month,
+            'total_progress_items': snapshot.total_progress_items,
+            'completed_items': snapshot.completed_items,
+            'completion_rate': snapshot.completion_rate,
+            'active_users_30d': snapshot.active_users_30d,
+            'stats_refreshed_at': snapshot.refreshed_at,
+            'stats_stale': snapshot.is_stale,
+        })
+
+class AdminAnalyticsView(APIView):
+    """
+    View for time-bucketed registration, completion and activity series
+
+    Query parameters: series (comma separated, default all), bucket
+    (day, week or month) and days (window length, default 30).
+    """
+    permission_classes = [IsAdminUser]
+    max_days = 730
+
+    def get(self, request):
+        names = request.query_params.get('series', ','.join(analytics.SERIES)).split(',')
+        bucket = request.query_params.get('bucket', 'day')
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = 0
+
+        unknown = [name for name in names if name not in analytics.SERIES]
+        if unknown:
+            return Response({'error': f"Unknown series: {', '.join(unknown)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if bucket not in analytics.BUCKETS:
+            return Response({'error': f"bucket must be one of {', '.join(analytics.BUCKETS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= self.max_days:
+            return Response({'error': f"days must be between 1 and {self.max_days}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'bucket': bucket,
+            'days': days,
+            'series': {name: analytics.build_series(name, days, bucket) for name in names},
+        })
+
+class AdminCohortView(APIView):
+    """
+    View for weekly signup cohort retention (query parameter: weeks, default 8)
+    """
+    permission_classes = [IsAdminUser]
+    max_weeks = 52
+
+    def get(self, request):
+        try:
+            weeks = int(request.query_params.get('weeks', 8))
+        except ValueError:
+            weeks = 0
+        if not 1 <= weeks <= self.max_weeks:
+            return Response({'error': f"weeks must be between 1 and {self.max_weeks}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'weeks': weeks, 'cohorts': analytics.cohort_retention(weeks)})
+
+class AdminCatalogImportView(APIView):
+    """
+    View for importing or updating a catalog in bulk: a JSON tree as the
+    request body, or a .json or .csv upload in the `file` field
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        try:
+            if upload is None:
+                data = request.data
+            elif upload.name.lower().endswith('.csv'):
+                data = upload.read().decode('utf-8-sig')
+            else:
+                data = json.loads(upload.read())
+        except ValueError:
+            return Response({'error': 'The file is not valid UTF-8 CSV or JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            topics, contents = parse_csv(data) if isinstance(data, str) else parse_tree(data)
+            result = import_catalog(topics, contents)
+        except CatalogImportError as e:
+            return Response({'error': str(e), 'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+class AdminExportView(APIView):
+    """
+    View streaming a whole table as NDJSON (query parameter: gzip=1 to
+    compress it)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, dataset):
+        if dataset not in DATASETS:
+            return Response({'error': f"dataset must be one of {', '.join(DATASETS)}"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        # ASGI servers need an async iterator to stream without buffering
+        is_asgi = isinstance(request._request, ASGIRequest)
+        chunks = aexport_ndjson(dataset) if is_asgi else export_ndjson(dataset)
+        filename = f"{dataset}.ndjson"
+        content_type = 'application/x-ndjson'
+        if request.query_params.get('gzip', '').lower() in ('1', 'true'):
+            chunks = agzip_stream(chunks) if is_asgi else gzip_stream(chunks)
+            filename += '.gz'
+            content_type = 'application/gzip'
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -15,6 +15,9 @@ python manage.py collectstatic --no-input
 # Apply migrations
 python manage.py migrate
 
+# Bring the denormalized topic counters in line with the stored contents
+python manage.py recompute_total_items
+
 # Create admin user if it doesn't exist
 python create_admin.py
 
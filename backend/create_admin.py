@@ -30,8 +30,7 @@ topic, created = Topic.objects.get_or_create(
     title='Test Topic',
     defaults={
         'description': 'A test topic',
-        'order': 1,
-        'total_items': 0
+        'order': 1
     }
 )
 
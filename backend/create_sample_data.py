@@ -62,8 +62,7 @@ def create_sample_data():
             title=topic_data['title'],
             defaults={
                 'description': topic_data['description'],
-                'order': topic_data['order'],
-                'total_items': 0
+                'order': topic_data['order']
             }
         )
         topics.append(topic)
@@ -89,8 +88,7 @@ def create_sample_data():
                 defaults={
                     'description': subtopic_data['description'],
                     'parent': parent,
-                    'order': subtopic_data['order'],
-                    'total_items': 0
+                    'order': subtopic_data['order']
                 }
             )
             topics.append(subtopic)
@@ -156,23 +154,10 @@ def create_sample_data():
             else:
                 print(f"Content already exists: {content.title}")
 
-    # Update total_items for each topic
+    # total_items is maintained automatically as contents are created
     for topic in all_topics:
-        # Count direct content items
-        direct_count = Content.objects.filter(topic=topic).count()
-
-        # Count content items in subtopics
-        subtopic_count = 0
-        for subtopic in Topic.objects.filter(parent=topic):
-            subtopic_content_count = Content.objects.filter(topic=subtopic).count()
-            subtopic.total_items = subtopic_content_count
-            subtopic.save()
-            subtopic_count += subtopic_content_count
-
-        # Update total_items
-        topic.total_items = direct_count + subtopic_count
-        topic.save()
-        print(f"Updated topic {topic.title}: total_items = {topic.total_items}")
+        topic.refresh_from_db(fields=['total_items'])
+        print(f"Topic {topic.title}: total_items = {topic.total_items}")
 
     # Create progress records
     for user in users:
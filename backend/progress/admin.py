@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Progress, OverallProgress
+from .models import Progress, OverallProgress, ProgressEvent
 
 @admin.register(Progress)
 class ProgressAdmin(admin.ModelAdmin):
@@ -11,3 +11,15 @@ class ProgressAdmin(admin.ModelAdmin):
 class OverallProgressAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_completed', 'total_items', 'get_percentage', 'last_activity')
     search_fields = ('user__username',)
+
+@admin.register(ProgressEvent)
+class ProgressEventAdmin(admin.ModelAdmin):
+    list_display = ('user', 'content', 'completed', 'created_at')
+    list_filter = ('completed',)
+
+    def has_change_permission(self, request, obj=None):
+        # The event log is append-only
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,369 @@
+"""
+Benchmark harness for the API endpoints.
+
+Every API route has a case in CASES that calls it against a dataset
+generated by seed_load. `run_benchmarks` sends each case through the DRF
+test client and records latency percentiles, SQL queries, rows fetched
+and response bytes, after a few warm-up calls so caches are primed.
+`compare` checks a report against a stored baseline.
+`compare_concurrency` measures the throughput of the sync and async
+variants of the read views under concurrent requests. The `benchmark`
+management command creates a scratch database and drives all of this.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.db.backends.utils import CursorDebugWrapper
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.test import APIClient
+
+from progress.views import AsyncOverallProgressView, OverallProgressView
+from topics.models import Topic, Content
+from topics.views import (
+    AsyncContentListView, AsyncTopicDetailView, AsyncTopicListView, ContentListView, TopicDetailView, TopicListView,
+)
+from users.tokens import create_access_token, issue_tokens
+
+User = get_user_model()
+
+# Dataset sizes, as seed_load options
+SIZES = {
+    'small': {'users': 100, 'roots': 3, 'depth': 2, 'fanout': 3, 'contents_per_topic': 5, 'progress_per_user': 20},
+    'medium': {'users': 1000, 'roots': 5, 'depth': 3, 'fanout': 4, 'contents_per_topic': 10, 'progress_per_user': 50},
+    'large': {'users': 10000, 'roots': 10, 'depth': 4, 'fanout': 4, 'contents_per_topic': 10, 'progress_per_user': 100},
+}
+
+PERCENTILES = (50, 95, 99)
+
+# Latency changes below this many milliseconds are treated as noise
+LATENCY_NOISE_MS = 1.0
+
+
+def _rotated(ids):
+    ids = list(ids)
+    return ids[1:] + ids[:1]
+
+
+Case = namedtuple('Case', ['name', 'method', 'auth', 'kwargs', 'data'], defaults=[None, None, None])
+
+CASES = [
+    Case('register', 'post', data=lambda ctx, i: {
+        'username': f"{ctx['prefix']}new{i}",
+        'email': f"{ctx['prefix']}new{i}@example.com",
+        'password': ctx['password'],
+        'password2': ctx['password'],
+    }),
+    Case('login', 'post', data=lambda ctx, i: {'username': ctx['user'].username, 'password': ctx['password']}),
+    Case('token-refresh', 'post', data=lambda ctx, i: {'refresh': issue_tokens(ctx['user'])['refresh']}),
+    Case('token-revoke', 'post', data=lambda ctx, i: {'refresh': issue_tokens(ctx['user'])['refresh']}),
+    Case('profile', 'get', auth='user'),
+    Case('change-password', 'put', auth='user', data=lambda ctx, i: {
+        'old_password': ctx['password'], 'new_password': ctx['password'], 'new_password2': ctx['password'],
+    }),
+    Case('topic-list', 'get', auth='user'),
+    Case('topic-detail', 'get', auth='user', kwargs=lambda ctx: {'pk': ctx['topic'].pk}),
+    Case('content-list', 'get', auth='user', kwargs=lambda ctx: {'topic_id': ctx['topic'].pk}),
+    Case('progress-map', 'get', auth='user'),
+    Case('progress-update', 'post', auth='user', kwargs=lambda ctx: {'content_id': ctx['content_ids'][0]},
+         data=lambda ctx, i: {'completed': i % 2 == 0}),
+    Case('progress-bulk', 'post', auth='user', data=lambda ctx, i: [
+        {'content_id': content_id, 'completed': i % 2 == 0} for content_id in ctx['content_ids']
+    ]),
+    Case('overall-progress', 'get', auth='user'),
+    Case('admin-login', 'post', data=lambda ctx, i: {'username': ctx['staff'].username, 'password': ctx['password']}),
+    Case('admin-dashboard', 'get', auth='staff'),
+    Case('admin-users', 'get', auth='staff'),
+    Case('admin-topics', 'get', auth='staff'),
+    Case('admin-topic-detail', 'get', auth='staff', kwargs=lambda ctx: {'pk': ctx['topic'].pk}),
+    Case('admin-content', 'get', auth='staff'),
+    # Each call moves the first item to the end
+    Case('admin-topic-reorder', 'post', auth='staff', data=lambda ctx, i: {'ids': _rotated(
+        Topic.objects.filter(parent=ctx['topic'].parent_id).order_by('order', 'id').values_list('id', flat=True)
+    )}),
+    Case('admin-content-reorder', 'post', auth='staff', data=lambda ctx, i: {'ids': _rotated(
+        Content.objects.filter(topic__in=Content.objects.filter(pk=ctx['content_ids'][0]).values('topic_id'))
+        .order_by('order', 'id').values_list('id', flat=True)
+    )}),
+    Case('admin-content-detail', 'get', auth='staff', kwargs=lambda ctx: {'pk': ctx['content_ids'][0]}),
+    Case('admin-user-stats', 'get', auth='staff'),
+    Case('admin-analytics', 'get', auth='staff'),
+    Case('admin-cohorts', 'get', auth='staff'),
+    Case('admin-import', 'post', auth='staff', data=lambda ctx, i: [{
+        'id': f"{ctx['prefix']}import",
+        'title': 'Imported',
+        'contents': [
+            {'id': f"{ctx['prefix']}import-{n}", 'title': f"Lesson {n}", 'content_type': 'video',
+             'url': 'https://example.com/video'}
+            for n in range(50)
+        ],
+    }]),
+    Case('admin-export', 'get', auth='staff', kwargs=lambda ctx: {'dataset': 'contents'}),
+]
+
+CASES_BY_NAME = {case.name: case for case in CASES}
+
+# Read routes served by an async view under ASGI, as (name, sync, async)
+ASYNC_VIEWS = [
+    ('topic-list', TopicListView, AsyncTopicListView),
+    ('topic-detail', TopicDetailView, AsyncTopicDetailView),
+    ('content-list', ContentListView, AsyncContentListView),
+    ('overall-progress', OverallProgressView, AsyncOverallProgressView),
+]
+
+
+class RowCountingCursor(CursorDebugWrapper):
+    """
+    Debug cursor that also counts the rows fetched through it
+    """
+    def __init__(self, cursor, db, recorder):
+        super().__init__(cursor, db)
+        self.recorder = recorder
+
+    def fetchone(self):
+        with self.db.wrap_database_errors:
+            row = self.cursor.fetchone()
+        self.recorder.rows += row is not None
+        return row
+
+    def fetchmany(self, size=None):
+        with self.db.wrap_database_errors:
+            rows = self.cursor.fetchmany(size) if size else self.cursor.fetchmany()
+        self.recorder.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        with self.db.wrap_database_errors:
+            rows = self.cursor.fetchall()
+        self.recorder.rows += len(rows)
+        return rows
+
+
+class QueryRecorder(CaptureQueriesContext):
+    """
+    Capture the queries of a block together with the number of rows they
+    returned
+    """
+    def __enter__(self):
+        self.rows = 0
+        self.connection.make_debug_cursor = lambda cursor: RowCountingCursor(cursor, self.connection, self)
+        return super().__enter__()
+
+    def __exit__(self, *args):
+        del self.connection.make_debug_cursor
+        super().__exit__(*args)
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def api_routes(patterns=None, prefix=''):
+    """
+    Return the names of all named routes under /api/
+    """
+    names = []
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            names += api_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern) and pattern.name and route.startswith('api/'):
+            names.append(pattern.name)
+    return names
+
+
+def build_context(prefix, password):
+    """
+    Pick the users and catalog items the cases run against from a seeded
+    dataset
+    """
+    user = User.objects.filter(username__startswith=prefix).order_by('id').first()
+    staff, _ = User.objects.get_or_create(username=f"{prefix}staff", defaults={'is_staff': True})
+    staff.set_password(password)
+    staff.save()
+    topic = Topic.objects.filter(parent=None).order_by('order', 'id').first()
+    return {
+        'prefix': prefix,
+        'password': password,
+        'user': user,
+        'staff': staff,
+        'topic': topic,
+        'content_ids': list(
+            Content.objects.filter(topic__path__startswith=topic.path).order_by('id').values_list('id', flat=True)[:50]
+        ),
+    }
+
+
+def run_case(case, context, iterations=20, warmup=3):
+    """
+    Call one case repeatedly and summarize its cost
+    """
+    client = APIClient()
+    if case.auth:
+        client.force_authenticate(user=context[case.auth])
+    path = reverse(case.name, kwargs=case.kwargs(context) if case.kwargs else None)
+    request = getattr(client, case.method)
+
+    latencies, queries, rows, sizes, statuses = [], [], [], [], set()
+    for i in range(warmup + iterations):
+        data = case.data(context, i) if case.data else None
+        with QueryRecorder(connection) as recorder:
+            started = time.perf_counter()
+            response = request(path, data, format='json') if data is not None else request(path)
+            # Streamed bodies are produced as they are consumed
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = (time.perf_counter() - started) * 1000
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(len(recorder))
+        rows.append(recorder.rows)
+        sizes.append(len(body))
+        statuses.add(response.status_code)
+
+    result = {'method': case.method.upper(), 'path': path, 'status': sorted(statuses)}
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(latencies, pct), 3)
+    result.update({
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries': max(queries),
+        'rows': max(rows),
+        'bytes': max(sizes),
+    })
+    return result
+
+
+def run_benchmarks(context, iterations=20, warmup=3, cases=CASES):
+    return {case.name: run_case(case, context, iterations, warmup) for case in cases}
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    Return the regressions of a report against a baseline report.
+
+    Query counts are deterministic, so any increase is a regression.
+    Latency, rows and bytes regress when they grow by more than
+    `tolerance`, latency also by more than LATENCY_NOISE_MS.
+    """
+    regressions = []
+    for size, cases in report['sizes'].items():
+        for name, current in cases.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(name)
+            if previous is None:
+                continue
+            for metric in ('queries', 'p95_ms', 'rows', 'bytes'):
+                before, after = previous[metric], current[metric]
+                if metric == 'queries':
+                    regressed = after > before
+                else:
+                    regressed = after > before * (1 + tolerance)
+                    if metric == 'p95_ms':
+                        regressed = regressed and after - before > LATENCY_NOISE_MS
+                if regressed:
+                    regressions.append({
+                        'size': size, 'case': name, 'metric': metric, 'baseline': before, 'current': after,
+                    })
+    return regressions
+
+
+async def _throughput(call, requests, concurrency):
+    """
+    Send `requests` calls with at most `concurrency` in flight
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], set()
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses.add(response.status_code)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests_per_s': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'status': sorted(statuses),
+    }
+
+
+def _close_worker_connections(executor, workers):
+    # Every worker must run one closer, so they all wait for each other
+    barrier = threading.Barrier(workers)
+
+    def close():
+        barrier.wait()
+        connections.close_all()
+    for future in [executor.submit(close) for _ in range(workers)]:
+        future.result()
+
+
+async def _compare_concurrency(context, levels, requests, workers, client_delay):
+    factory = RequestFactory()
+    headers = {'HTTP_AUTHORIZATION': f"Bearer {create_access_token(context['user'])}"}
+    loop = asyncio.get_running_loop()
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for name, sync_view, async_view in ASYNC_VIEWS:
+            kwargs = CASES_BY_NAME[name].kwargs(context) if CASES_BY_NAME[name].kwargs else {}
+            path = reverse(name, kwargs=kwargs)
+            sync_handler, async_handler = sync_view.as_view(), async_view.as_view()
+
+            def serve_sync():
+                response = sync_handler(factory.get(path, **headers), **kwargs).render()
+                time.sleep(client_delay)
+                return response
+
+            def call_sync():
+                return loop.run_in_executor(executor, serve_sync)
+
+            async def call_async():
+                response = await async_handler(factory.get(path, **headers), **kwargs)
+                await asyncio.sleep(client_delay)
+                return response
+
+            # Prime the caches before measuring
+            await call_sync()
+            await call_async()
+            results[name] = {
+                concurrency: {
+                    'sync': await _throughput(call_sync, requests, concurrency),
+                    'async': await _throughput(call_async, requests, concurrency),
+                }
+                for concurrency in levels
+            }
+        _close_worker_connections(executor, workers)
+    await sync_to_async(connections.close_all)()
+    return results
+
+
+def compare_concurrency(context, levels=(1, 10, 50), requests=200, workers=4, client_delay=0):
+    """
+    Compare the throughput of the sync and async read views.
+
+    Requests are sent `concurrency` at a time for each level. The sync
+    views run on a pool of `workers` threads, like the threads of WSGI
+    workers, so requests beyond that queue; the async views all run on
+    one event loop. Each request carries a signed access token.
+
+    `client_delay` seconds are spent after each response, as if sending
+    it to a slow client: a sync worker is blocked meanwhile, the event
+    loop is not.
+    """
+    return asyncio.run(_compare_concurrency(context, levels, requests, workers, client_delay))
@@ -0,0 +1,109 @@
+"""
+Batched writer for the append-only ProgressEvent log.
+
+Progress views hand events to record_events() once their transaction
+commits. Events are buffered per process and written with one
+bulk_create per batch, on a background thread when
+PROGRESS_EVENT_ASYNC is on, so the request that fills the batch does
+not pay for the insert. A batch is written when it reaches
+PROGRESS_EVENT_BATCH_SIZE events or, by a timer, once its oldest event
+is PROGRESS_EVENT_MAX_DELAY seconds old, and whatever is left is written
+when the process exits.
+
+A worker killed outright (SIGKILL, a gunicorn worker timeout) loses at
+most the last PROGRESS_EVENT_MAX_DELAY seconds of its events. Setting
+PROGRESS_EVENT_BATCH_SIZE=1 and PROGRESS_EVENT_ASYNC=False writes each
+event as soon as its transaction commits instead.
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending = []
+_oldest = None
+_executor = None
+_timer = None
+
+
+def record_events(events):
+    """
+    Queue ProgressEvent instances to be written once the current
+    transaction commits
+    """
+    if events:
+        transaction.on_commit(lambda: _enqueue(events))
+
+
+def _enqueue(events):
+    global _oldest, _timer
+    with _lock:
+        if not _pending:
+            _oldest = time.monotonic()
+        _pending.extend(events)
+        due = (
+            len(_pending) >= settings.PROGRESS_EVENT_BATCH_SIZE
+            or time.monotonic() - _oldest >= settings.PROGRESS_EVENT_MAX_DELAY
+        )
+        if not due and _timer is None:
+            # Write the batch on time even if no further event arrives
+            _timer = threading.Timer(settings.PROGRESS_EVENT_MAX_DELAY, _flush_in_background)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        if settings.PROGRESS_EVENT_ASYNC:
+            _get_executor().submit(_flush_in_background)
+        else:
+            flush()
+
+
+def flush():
+    """
+    Write every buffered event now
+    """
+    from .models import ProgressEvent
+
+    global _oldest, _timer
+    with _lock:
+        batch = _pending[:]
+        del _pending[:]
+        _oldest = None
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    if batch:
+        ProgressEvent.objects.bulk_create(batch, batch_size=500)
+    return len(batch)
+
+
+def _flush_in_background():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Failed to write progress events")
+    finally:
+        # The worker thread keeps no connection open between batches
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='progress-events')
+        return _executor
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Failed to write progress events at exit")
@@ -0,0 +1,137 @@
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from progress.benchmark import (
+    ASYNC_VIEWS, CASES, SIZES, api_routes, build_context, compare, compare_concurrency, run_benchmarks,
+)
+
+PREFIX = 'bench'
+PASSWORD = 'loadtest'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every API route against seeded datasets of several sizes in a scratch '
+        'database, write a JSON report and compare it with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='small,medium', help=f"Comma separated, from {', '.join(SIZES)}")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', default='benchmark.json', help='Where to write the JSON report')
+        parser.add_argument('--baseline', help='Report to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative growth of latency, rows and bytes')
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument(
+            '--concurrency', default='1,10,50',
+            help='Comma separated numbers of concurrent requests to compare the sync and async read views at, '
+                 'empty to skip'
+        )
+        parser.add_argument('--concurrent-requests', type=int, default=200, help='Requests per concurrency level')
+        parser.add_argument('--workers', type=int, default=4, help='Threads serving the sync views')
+        parser.add_argument(
+            '--client-delay', type=float, default=0,
+            help='Milliseconds each response takes to reach a (slow) client in the concurrency comparison'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        try:
+            options['concurrency'] = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError:
+            raise CommandError('--concurrency takes comma separated integers')
+        unknown = set(sizes) - set(SIZES)
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(sorted(unknown))}")
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+
+        covered = {case.name for case in CASES}
+        uncovered = [name for name in api_routes() if name not in covered]
+        for name in uncovered:
+            self.stderr.write(self.style.WARNING(f"No benchmark case for route '{name}'"))
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'uncovered': uncovered,
+            'sizes': {},
+            'concurrency': {},
+        }
+
+        # A scratch database and a private cache, so nothing real is touched
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}},
+                PROGRESS_EVENT_ASYNC=False,
+                # The harness does its own measuring
+                REQUEST_METRICS_SAMPLE_RATE=0,
+            ):
+                for size in sizes:
+                    report['sizes'][size], report['concurrency'][size] = self.run_size(size, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"Report written to {options['output']}")
+
+        if baseline is None:
+            return
+        regressions = compare(report, baseline, options['tolerance'])
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(
+                "{size} {case}: {metric} {baseline} -> {current}".format(**regression)
+            ))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+        elif options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regressions against {options['baseline']}")
+
+    def run_size(self, size, options):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        call_command(
+            'seed_load', seed=options['seed'], prefix=PREFIX, password=PASSWORD, stdout=StringIO(), **SIZES[size]
+        )
+        context = build_context(f"{PREFIX}{options['seed']}_", PASSWORD)
+        results = run_benchmarks(context, options['iterations'], options['warmup'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{size} dataset"))
+        for name, result in results.items():
+            self.stdout.write(
+                f"  {name:<22} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                f"p99 {result['p99_ms']:8.2f}ms  {result['queries']:3d} queries  "
+                f"{result['rows']:6d} rows  {result['bytes']:8d} bytes"
+            )
+
+        if not options['concurrency']:
+            return results, {}
+        throughput = compare_concurrency(
+            context, options['concurrency'], options['concurrent_requests'], options['workers'],
+            options['client_delay'] / 1000,
+        )
+        self.stdout.write(f"  sync ({options['workers']} threads) vs async, requests/s")
+        for name, _, _ in ASYNC_VIEWS:
+            for concurrency, modes in throughput[name].items():
+                self.stdout.write(
+                    f"  {name:<22} x{concurrency:<4d} sync {modes['sync']['requests_per_s']:8.1f}  "
+                    f"async {modes['async']['requests_per_s']:8.1f}  "
+                    f"p95 {modes['sync']['p95_ms']:8.2f}ms / {modes['async']['p95_ms']:8.2f}ms"
+                )
+        return results, throughput
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from progress.models import Progress, OverallProgress, ProgressEvent
+from topics.catalog import get_catalog_size, invalidate_catalog_size
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in the incrementally maintained OverallProgress counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--from-events', action='store_true',
+            help='Rebuild the counters from the ProgressEvent log instead of the Progress table'
+        )
+
+    def handle(self, *args, **options):
+        invalidate_catalog_size()
+        total_items = get_catalog_size()
+
+        # One grouped query gives the true completed count for every user
+        if options['from_events']:
+            completed = ProgressEvent.replay_completed_counts()
+        else:
+            completed = dict(
+                Progress.objects.values_list('user').annotate(
+                    count=Count('id', filter=Q(completed=True))
+                ).order_by()
+            )
+
+        drifted = []
+        for overall in OverallProgress.objects.iterator(chunk_size=options['batch_size']):
+            expected = completed.pop(overall.user_id, 0)
+            if overall.total_completed != expected or overall.total_items != total_items:
+                overall.total_completed = expected
+                overall.total_items = total_items
+                drifted.append(overall)
+
+        # Users with progress rows but no counters yet
+        missing = [
+            OverallProgress(user_id=user_id, total_completed=count, total_items=total_items)
+            for user_id, count in completed.items()
+        ]
+
+        if not options['dry_run']:
+            OverallProgress.objects.bulk_update(
+                drifted, ['total_completed', 'total_items'], batch_size=options['batch_size']
+            )
+            OverallProgress.objects.bulk_create(missing, batch_size=options['batch_size'], ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {len(drifted)} counters and created {len(missing)} "
+            f"({total_items} catalog items){' [dry run]' if options['dry_run'] else ''}"
+        ))
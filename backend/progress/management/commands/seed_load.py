@@ -0,0 +1,229 @@
+import csv
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from progress.models import Progress, ProgressEvent
+from topics.catalog import bump_catalog_version, invalidate_catalog_size
+from topics.models import Topic, Content, PATH_SEPARATOR
+
+User = get_user_model()
+
+CONTENT_TYPES = [content_type for content_type, _ in Content.CONTENT_TYPES]
+# NULL marker for COPY, so that empty strings stay empty strings
+COPY_NULL = r'\N'
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset for load testing: users, a topic tree, contents, '
+        'progress rows and their events. The same seed produces the same dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--roots', type=int, default=5, help='Number of root topics')
+        parser.add_argument('--depth', type=int, default=3, help='Levels of the topic tree, roots included')
+        parser.add_argument('--fanout', type=int, default=4, help='Subtopics per topic')
+        parser.add_argument('--contents-per-topic', type=int, default=10)
+        parser.add_argument('--progress-per-user', type=int, default=50, help='Content items touched per user')
+        parser.add_argument('--completion-rate', type=float, default=0.7)
+        parser.add_argument('--days', type=int, default=365, help='Spread sign-ups over this many days')
+        parser.add_argument('--prefix', default='load', help='Username prefix of the generated users')
+        parser.add_argument('--password', default='loadtest', help='Password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Load users, contents, progress and events with COPY (PostgreSQL only)'
+        )
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy requires PostgreSQL')
+        if not 0 <= options['completion_rate'] <= 1:
+            raise CommandError('--completion-rate must be between 0 and 1')
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        self.prefix = f"{options['prefix']}{options['seed']}_"
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(f"Users for seed {options['seed']} already exist, use another --seed or --prefix")
+
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        # Anchored to the start of the day, so reruns on the same day match
+        self.now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.report = []
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            joined = self.create_users()
+            topic_ids = self.create_topics()
+            content_ids = self.create_contents(topic_ids)
+            self.create_progress(joined, content_ids)
+            self.create_events()
+
+            # Bulk inserts skip save() and the signals, so bring the
+            # denormalized counters and catalog caches up to date here
+            Topic.recompute_total_items(batch_size=options['batch_size'])
+            call_command('reconcile_progress', batch_size=options['batch_size'], stdout=io.StringIO())
+        invalidate_catalog_size()
+        bump_catalog_version()
+        elapsed = time.perf_counter() - started
+
+        for table, rows, seconds in self.report:
+            self.stdout.write(f"{table:<24} {rows:>10} rows  {seconds:8.2f}s  {rows / max(seconds, 1e-6):>10.0f} rows/s")
+        total = sum(rows for _, rows, _ in self.report)
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-6):.0f} rows/s, seed {options['seed']})"
+        ))
+
+    def create_users(self):
+        """
+        Create the users and return their ids mapped to their join dates
+        """
+        # Hashing is deliberately slow, so every user shares one hash
+        password = make_password(self.options['password'])
+        span = self.options['days'] * 86400
+
+        def users():
+            for i in range(self.options['users']):
+                date_joined = self.now - timedelta(seconds=self.rng.randrange(span))
+                yield User(
+                    username=f"{self.prefix}{i}",
+                    email=f"{self.prefix}{i}@example.com",
+                    password=password,
+                    date_joined=date_joined,
+                    last_login=self.moment_after(date_joined),
+                )
+
+        self.insert(User, users())
+        return dict(User.objects.filter(username__startswith=self.prefix).order_by('id').values_list('id', 'date_joined'))
+
+    def create_topics(self):
+        """
+        Create the topic tree level by level and return the ids of all topics
+        """
+        started = time.perf_counter()
+        level = [None]
+        topic_ids = []
+        for depth in range(self.options['depth']):
+            width = self.options['roots'] if depth == 0 else self.options['fanout']
+            topics = []
+            for parent in level:
+                for order in range(width):
+                    topic = Topic(description='Generated for load testing', order=order, parent=parent)
+                    topic.label = f"{parent.label}.{order + 1}" if parent else str(order + 1)
+                    topic.title = f"Topic {topic.label}"
+                    topics.append(topic)
+            Topic.objects.bulk_create(topics, batch_size=self.options['batch_size'])
+
+            # Paths need the new ids, so they are filled in afterwards
+            for topic in topics:
+                topic.path = f"{topic.parent.path if topic.parent else ''}{topic.pk}{PATH_SEPARATOR}"
+            Topic.objects.bulk_update(topics, ['path'], batch_size=self.options['batch_size'])
+            topic_ids.extend(topic.pk for topic in topics)
+            level = topics
+
+        self.report.append((Topic._meta.db_table, len(topic_ids), time.perf_counter() - started))
+        return topic_ids
+
+    def create_contents(self, topic_ids):
+        """
+        Create the contents of every topic and return their ids
+        """
+        last_id = Content.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+        def contents():
+            for topic_id in topic_ids:
+                for order in range(self.options['contents_per_topic']):
+                    content_type = self.rng.choice(CONTENT_TYPES)
+                    yield Content(
+                        topic_id=topic_id,
+                        title=f"{content_type.title()} {order}",
+                        content_type=content_type,
+                        url=f"https://example.com/{content_type}/{topic_id}/{order}",
+                        order=order,
+                    )
+
+        self.insert(Content, contents())
+        return list(Content.objects.filter(pk__gt=last_id).order_by('id').values_list('id', flat=True))
+
+    def create_progress(self, joined, content_ids):
+        """
+        Create the progress rows of every user
+        """
+        per_user = min(self.options['progress_per_user'], len(content_ids))
+
+        def progress():
+            for user_id, date_joined in joined.items():
+                for content_id in self.rng.sample(content_ids, per_user):
+                    completed = self.rng.random() < self.options['completion_rate']
+                    yield Progress(
+                        user_id=user_id,
+                        content_id=content_id,
+                        completed=completed,
+                        completed_at=self.moment_after(date_joined) if completed else None,
+                    )
+
+        self.insert(Progress, progress())
+
+    def create_events(self):
+        """
+        Log a completion event for every completed progress row
+        """
+        completed = Progress.objects.filter(
+            user__username__startswith=self.prefix, completed=True
+        ).order_by('id').values_list('user_id', 'content_id', 'completed_at')
+        self.insert(ProgressEvent, (
+            ProgressEvent(user_id=user_id, content_id=content_id, completed=True, created_at=completed_at)
+            for user_id, content_id, completed_at in completed.iterator(chunk_size=self.options['batch_size'])
+        ))
+
+    def moment_after(self, start):
+        """
+        Return a random moment between `start` and now
+        """
+        return start + timedelta(seconds=self.rng.randrange(int((self.now - start).total_seconds()) + 1))
+
+    def insert(self, model, objs):
+        """
+        Insert model instances in batches, with COPY when enabled
+        """
+        started = time.perf_counter()
+        objs = iter(objs)
+        rows = 0
+        while batch := list(islice(objs, self.options['batch_size'])):
+            if self.options['copy']:
+                self.copy(model, batch)
+            else:
+                model.objects.bulk_create(batch)
+            rows += len(batch)
+        self.report.append((model._meta.db_table, rows, time.perf_counter() - started))
+
+    def copy(self, model, batch):
+        fields = [field for field in model._meta.concrete_fields if not isinstance(field, models.AutoField)]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for obj in batch:
+            values = [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+            writer.writerow([COPY_NULL if value is None else value for value in values])
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buffer,
+            )
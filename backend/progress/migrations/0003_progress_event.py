@@ -0,0 +1,71 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_events(apps, schema_editor):
+    """
+    Seed the event log with one event per currently completed item, so
+    replays from the log match the existing Progress state
+    """
+    Progress = apps.get_model('progress', 'Progress')
+    ProgressEvent = apps.get_model('progress', 'ProgressEvent')
+    completed = Progress.objects.filter(completed=True).order_by('id')
+
+    batch = []
+    for user_id, content_id, completed_at, updated_at in completed.values_list(
+        'user_id', 'content_id', 'completed_at', 'updated_at'
+    ).iterator(chunk_size=2000):
+        batch.append(ProgressEvent(
+            user_id=user_id, content_id=content_id, completed=True, created_at=completed_at or updated_at
+        ))
+        if len(batch) == 2000:
+            ProgressEvent.objects.bulk_create(batch)
+            batch = []
+    ProgressEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0002_initial'),
+        ('topics', '0004_topic_total_items_editable'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed', models.BooleanField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='progressevent',
+            name='content',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='topics.content'),
+        ),
+        migrations.AddField(
+            model_name='progressevent',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='progressevent',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['created_at'], name='event_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progressevent',
+            index=models.Index(fields=['created_at', 'user'], name='event_activity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progressevent',
+            index=models.Index(fields=['user', 'content', 'created_at', 'id'], name='event_replay_idx'),
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('progress', '0003_progress_event'),
+        ('topics', '0005_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='progress',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['user', 'content'], name='progress_completed_idx'),
+        ),
+    ]
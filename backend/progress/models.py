@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import F, Q
 from django.conf import settings
+from django.utils import timezone
+from topics.catalog import get_catalog_size
 from topics.models import Content
 
 class Progress(models.Model):
@@ -16,6 +19,11 @@ class Progress(models.Model):
     class Meta:
         unique_together = ['user', 'content']
         verbose_name_plural = 'Progress'
+        indexes = [
+            # Completed items of a user: progress map, completion flags,
+            # subtree rollups and completed counts
+            models.Index(fields=['user', 'content'], condition=Q(completed=True), name='progress_completed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.content.title} - {'Completed' if self.completed else 'In Progress'}"
@@ -36,3 +44,74 @@ class OverallProgress(models.Model):
         if self.total_items == 0:
             return 0
         return int((self.total_completed / self.total_items) * 100)
+
+    @classmethod
+    def record_change(cls, user, delta=0):
+        """
+        Apply a change of `delta` completed items to the user's counters with
+        a single atomic UPDATE, creating the row from a full count if needed
+        """
+        fields = {'total_items': get_catalog_size(), 'last_activity': timezone.now()}
+        if delta:
+            fields['total_completed'] = F('total_completed') + delta
+        if not cls.objects.filter(user=user).update(**fields):
+            cls.objects.get_or_create(user=user, defaults={
+                'total_completed': Progress.objects.filter(user=user, completed=True).count(),
+                'total_items': fields['total_items'],
+            })
+
+class ProgressEvent(models.Model):
+    """
+    Append-only log of progress changes, one row per completed flag change.
+
+    Rows are never updated or deleted. Analytics, cohort reports and
+    OverallProgress reconstruction read this table instead of the hot
+    Progress table. The user and content references carry no database
+    constraint so the history survives catalog edits, and events are
+    written in batches off the request path (see progress.events).
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    content = models.ForeignKey(
+        'topics.Content', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    completed = models.BooleanField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Completions per period
+            models.Index(fields=['created_at'], condition=Q(completed=True), name='event_completed_idx'),
+            # Distinct active users per period; covers the query on PostgreSQL
+            models.Index(fields=['created_at', 'user'], name='event_activity_idx'),
+            # Latest state per user and content for replays
+            models.Index(fields=['user', 'content', 'created_at', 'id'], name='event_replay_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {'completed' if self.completed else 'uncompleted'} {self.content_id} at {self.created_at}"
+
+    @classmethod
+    def replay_completed_counts(cls, user_ids=None):
+        """
+        Rebuild {user_id: completed items} from each user's latest event
+        per content
+        """
+        from django.db.models import Count, F, Window
+        from django.db.models.functions import FirstValue
+
+        events = cls.objects.all()
+        if user_ids is not None:
+            events = events.filter(user_id__in=user_ids)
+        # Events are written in per-process batches, so ids follow flush
+        # order; the latest event is the one created last
+        latest = events.annotate(last_id=Window(
+            FirstValue('id'),
+            partition_by=[F('user'), F('content')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )).filter(id=F('last_id')).values('id')
+        return dict(
+            cls.objects.filter(id__in=latest, completed=True)
+            .order_by().values_list('user').annotate(count=Count('id'))
+        )
@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from takeyouforward.middleware import TimedSerializerMixin
 from .models import Progress, OverallProgress
 
-class ProgressSerializer(serializers.ModelSerializer):
+class ProgressSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Progress model
     """
@@ -13,7 +14,7 @@ class ProgressSerializer(serializers.ModelSerializer):
         fields = ['id', 'content', 'content_title', 'content_type', 'completed', 'completed_at']
         read_only_fields = ['id', 'content_title', 'content_type', 'completed_at']
 
-class OverallProgressSerializer(serializers.ModelSerializer):
+class OverallProgressSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for OverallProgress model
     """
@@ -26,3 +27,10 @@ class OverallProgressSerializer(serializers.ModelSerializer):
     
     def get_percentage(self, obj):
         return obj.get_percentage()
+
+class BulkProgressItemSerializer(serializers.Serializer):
+    """
+    Serializer for one entry of a bulk progress update
+    """
+    content_id = serializers.IntegerField()
+    completed = serializers.BooleanField()
@@ -1,3 +1,418 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from takeyouforward.queryplan import QueryPlanAssertions, analyze
+from topics.models import Topic, Content
+from users.tokens import create_access_token
+from .benchmark import ASYNC_VIEWS, CASES, SIZES, api_routes, build_context, compare, compare_concurrency, run_benchmarks
+from . import events
+from .models import Progress, OverallProgress, ProgressEvent
+from .views import AsyncOverallProgressView
+
+User = get_user_model()
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+class ProgressAPITestCase(APITestCase):
+    """
+    Shared fixtures for the progress endpoint tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='learner', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(title='Topic')
+        self.contents = [
+            Content.objects.create(
+                topic=self.topic,
+                title=f"Content {i}",
+                content_type='video',
+                url='https://example.com/video',
+                order=i
+            )
+            for i in range(5)
+        ]
+
+    def mark(self, content, completed):
+        return self.client.post(
+            reverse('progress-update', args=[content.pk]), {'completed': completed}, format='json'
+        )
+
+    def overall(self):
+        return OverallProgress.objects.get(user=self.user)
+
+class ProgressUpdateViewTests(ProgressAPITestCase):
+    """
+    Tests for incremental OverallProgress maintenance
+    """
+    def test_counters_follow_completion_changes(self):
+        self.mark(self.contents[0], True)
+        self.mark(self.contents[1], True)
+        self.assertEqual(self.overall().total_completed, 2)
+        self.assertEqual(self.overall().total_items, 5)
+
+        # Repeating the same state does not double count
+        self.mark(self.contents[1], True)
+        self.assertEqual(self.overall().total_completed, 2)
+
+        self.mark(self.contents[0], False)
+        self.assertEqual(self.overall().total_completed, 1)
+
+    def test_form_encoded_false_is_not_a_completion(self):
+        url = reverse('progress-update', args=[self.contents[0].pk])
+        self.client.post(url, {'completed': 'false'})
+        self.assertEqual(self.overall().total_completed, 0)
+        self.assertFalse(Progress.objects.get(user=self.user, content=self.contents[0]).completed)
+
+        self.client.post(url, {'completed': 'true'})
+        self.assertEqual(self.overall().total_completed, 1)
+        self.assertEqual(self.client.post(url, {'completed': 'maybe'}).status_code, 400)
+
+    def test_write_cost_is_independent_of_history(self):
+        self.mark(self.contents[0], True)
+        self.mark(self.contents[1], True)
+        with self.assertNumQueries(6) as toggle:
+            self.mark(self.contents[1], False)
+        self.assertFalse(any('COUNT' in query['sql'] for query in toggle.captured_queries))
+
+        for content in self.contents[2:]:
+            Progress.objects.create(user=self.user, content=content, completed=True)
+        with self.assertNumQueries(6):
+            self.mark(self.contents[1], True)
+
+class ReconcileProgressCommandTests(ProgressAPITestCase):
+    """
+    Tests for the reconcile_progress management command
+    """
+    def test_repairs_drift_and_missing_counters(self):
+        self.mark(self.contents[0], True)
+        OverallProgress.objects.filter(user=self.user).update(total_completed=4, total_items=1)
+        other = User.objects.create_user(username='other', password='pass12345')
+        Progress.objects.create(user=other, content=self.contents[0], completed=True)
+
+        call_command('reconcile_progress', stdout=StringIO())
+
+        self.assertEqual(self.overall().total_completed, 1)
+        self.assertEqual(self.overall().total_items, 5)
+        self.assertEqual(OverallProgress.objects.get(user=other).total_completed, 1)
+
+class SeedLoadCommandTests(ProgressAPITestCase):
+    """
+    Tests for the seed_load management command
+    """
+    def seed(self, prefix):
+        call_command(
+            'seed_load', seed=3, prefix=prefix, users=20, roots=2, depth=3, fanout=2,
+            contents_per_topic=3, progress_per_user=10, stdout=StringIO()
+        )
+        return [
+            (username[len(prefix):], title, completed)
+            for username, title, completed in Progress.objects.filter(
+                user__username__startswith=prefix
+            ).order_by('id').values_list('user__username', 'content__topic__title', 'completed')
+        ]
+
+    def test_generates_a_consistent_dataset(self):
+        first = self.seed('a')
+
+        self.assertEqual(User.objects.filter(username__startswith='a3_').count(), 20)
+        self.assertEqual(len(first), 200)
+        root = Topic.objects.get(title='Topic 2')
+        self.assertEqual(root.get_descendants(include_self=True).count(), 7)
+        self.assertEqual(root.total_items, 21)
+        completed = sum(1 for _, _, done in first if done)
+        self.assertEqual(ProgressEvent.objects.filter(completed=True).count(), completed)
+        self.assertEqual(
+            sum(OverallProgress.objects.values_list('total_completed', flat=True)), completed
+        )
+
+        self.assertEqual(self.seed('b'), first)
+
+    def test_refuses_to_reuse_a_seed(self):
+        self.seed('a')
+        with self.assertRaises(CommandError):
+            self.seed('a')
+
+class BenchmarkTests(ProgressAPITestCase):
+    """
+    Tests for the endpoint benchmark harness
+    """
+    def test_every_api_route_has_a_case(self):
+        self.assertEqual(set(api_routes()) - {case.name for case in CASES}, set())
+
+    def test_runs_every_case(self):
+        call_command('seed_load', prefix='bench', password='loadtest', stdout=StringIO(), **SIZES['small'])
+        context = build_context('bench0_', 'loadtest')
+
+        results = run_benchmarks(context, iterations=2, warmup=1)
+
+        self.assertEqual(set(results), {case.name for case in CASES})
+        for name, result in results.items():
+            self.assertTrue(all(status < 400 for status in result['status']), name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(results['overall-progress']['queries'], 1)
+        self.assertGreater(results['progress-map']['rows'], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'sizes': {'small': {'topic-list': {'queries': 2, 'p95_ms': 10.0, 'rows': 10, 'bytes': 1000}}}}
+        report = {'sizes': {'small': {'topic-list': {'queries': 3, 'p95_ms': 10.5, 'rows': 10, 'bytes': 1500}}}}
+
+        regressions = compare(report, baseline, tolerance=0.2)
+
+        self.assertEqual([r['metric'] for r in regressions], ['queries', 'bytes'])
+        self.assertEqual(compare(baseline, baseline), [])
+
+class ConcurrencyBenchmarkTests(TransactionTestCase):
+    """
+    Tests for the sync / async throughput comparison, whose worker
+    threads need committed data
+    """
+    def test_compares_every_async_view(self):
+        cache.clear()
+        call_command('seed_load', prefix='bench', password='loadtest', stdout=StringIO(), **SIZES['small'])
+        context = build_context('bench0_', 'loadtest')
+
+        results = compare_concurrency(context, levels=(1, 4), requests=8, workers=2)
+
+        self.assertEqual(list(results), [name for name, _, _ in ASYNC_VIEWS])
+        for name, levels in results.items():
+            self.assertEqual(set(levels), {1, 4})
+            for modes in levels.values():
+                self.assertEqual(modes['sync']['status'], [200], name)
+                self.assertEqual(modes['async']['status'], [200], name)
+                self.assertGreater(modes['async']['requests_per_s'], 0)
+
+class AsyncOverallProgressViewTests(ProgressAPITestCase):
+    """
+    Tests for the async overall progress view
+    """
+    def get(self):
+        request = AsyncRequestFactory().get('/', headers={'Authorization': f"Bearer {create_access_token(self.user)}"})
+        return async_to_sync(AsyncOverallProgressView.as_view())(request)
+
+    def test_initializes_and_matches_the_sync_view(self):
+        Progress.objects.create(user=self.user, content=self.contents[0], completed=True)
+        OverallProgress.objects.filter(user=self.user).delete()
+
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(response.content, self.client.get(reverse('overall-progress')).content.decode())
+        self.assertEqual(self.overall().total_completed, 1)
+        self.assertEqual(self.overall().total_items, 5)
+
+class BulkProgressUpdateViewTests(ProgressAPITestCase):
+    """
+    Tests for the bulk progress endpoint
+    """
+    def bulk(self, items):
+        return self.client.post(reverse('progress-bulk'), items, format='json')
+
+    def test_applies_batch_and_reports_each_item(self):
+        self.mark(self.contents[0], True)
+        self.mark(self.contents[1], True)
+
+        response = self.bulk([
+            {'content_id': self.contents[0].pk, 'completed': True},
+            {'content_id': self.contents[1].pk, 'completed': False},
+            {'content_id': self.contents[2].pk, 'completed': True},
+            {'content_id': self.contents[3].pk, 'completed': False},
+            {'content_id': self.contents[3].pk, 'completed': True},
+            {'content_id': 9999, 'completed': True},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        statuses = {item['content_id']: item['status'] for item in response.data['results']}
+        self.assertEqual(statuses, {
+            self.contents[0].pk: 'unchanged',
+            self.contents[1].pk: 'updated',
+            self.contents[2].pk: 'created',
+            self.contents[3].pk: 'created',
+            9999: 'not_found',
+        })
+        completed = set(Progress.objects.filter(user=self.user, completed=True).values_list('content_id', flat=True))
+        self.assertEqual(completed, {self.contents[0].pk, self.contents[2].pk, self.contents[3].pk})
+        self.assertEqual(self.overall().total_completed, 3)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        self.mark(self.contents[0], True)
+        with self.assertNumQueries(6):
+            self.bulk([{'content_id': content.pk, 'completed': True} for content in self.contents])
+        self.assertEqual(self.overall().total_completed, 5)
+
+    def test_rejects_invalid_items(self):
+        response = self.bulk([{'content_id': 'abc'}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_oversized_batches_before_validation(self):
+        response = self.bulk([{'content_id': 'abc'}] * 501)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('At most 500', response.data['error'])
+
+    def test_unchanged_items_are_not_written(self):
+        self.mark(self.contents[0], True)
+        updated_at = Progress.objects.get(user=self.user, content=self.contents[0]).updated_at
+
+        # No upsert or counter update, only the lookups
+        with self.assertNumQueries(4):
+            response = self.bulk([{'content_id': self.contents[0].pk, 'completed': True}])
+        self.assertEqual(response.data['results'][0]['status'], 'unchanged')
+        self.assertEqual(Progress.objects.get(user=self.user, content=self.contents[0]).updated_at, updated_at)
+
+class ProgressMapViewTests(ProgressAPITestCase):
+    """
+    Tests for the per-user completion map
+    """
+    def test_returns_completed_items_only(self):
+        self.mark(self.contents[0], True)
+        self.mark(self.contents[1], True)
+        self.mark(self.contents[1], False)
+
+        response = self.client.get(reverse('progress-map'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data), [self.contents[0].pk])
+
+    def test_unchanged_state_returns_not_modified(self):
+        self.mark(self.contents[0], True)
+        etag = self.client.get(reverse('progress-map'))['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('progress-map'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.mark(self.contents[1], True)
+        response = self.client.get(reverse('progress-map'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_is_scoped_to_the_user(self):
+        etag = self.client.get(reverse('progress-map'))['ETag']
+
+        # Another user with the same (empty) state gets a different ETag
+        self.client.force_authenticate(user=User.objects.create_user(username='other', password='pass12345'))
+        response = self.client.get(reverse('progress-map'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+class ProgressEventTests(ProgressAPITestCase):
+    """
+    Tests for the append-only progress event log
+    """
+    def setUp(self):
+        super().setUp()
+        # Start from an empty buffer
+        events.flush()
+
+    def events(self):
+        return list(ProgressEvent.objects.order_by('id').values_list('content_id', 'completed'))
+
+    def test_changes_are_logged_once(self):
+        first, second = self.contents[:2]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mark(first, True)
+            self.mark(first, True)
+            self.mark(first, False)
+            self.mark(second, False)
+            self.client.post(reverse('progress-bulk'), [
+                {'content_id': first.pk, 'completed': True},
+                {'content_id': second.pk, 'completed': True},
+            ], format='json')
+
+        # Buffered until the batch fills up or its delay passes
+        self.assertEqual(self.events(), [])
+        self.assertEqual(events.flush(), 4)
+        self.assertEqual(self.events(), [
+            (first.pk, True), (first.pk, False), (first.pk, True), (second.pk, True),
+        ])
+
+    def test_overall_progress_replays_from_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for content in self.contents[:3]:
+                self.mark(content, True)
+            self.mark(self.contents[0], False)
+        events.flush()
+        OverallProgress.objects.filter(user=self.user).update(total_completed=0)
+
+        self.assertEqual(ProgressEvent.replay_completed_counts(), {self.user.pk: 2})
+        call_command('reconcile_progress', '--from-events', stdout=StringIO())
+        self.assertEqual(self.overall().total_completed, 2)
+
+    def test_replay_follows_event_time_not_write_order(self):
+        now = timezone.now()
+        # A worker flushed the later "uncompleted" event before another
+        # worker flushed the earlier completion
+        ProgressEvent.objects.create(user=self.user, content=self.contents[0], completed=False, created_at=now)
+        ProgressEvent.objects.create(
+            user=self.user, content=self.contents[0], completed=True, created_at=now - timedelta(seconds=1)
+        )
+        ProgressEvent.objects.create(user=self.user, content=self.contents[1], completed=True, created_at=now)
+
+        self.assertEqual(ProgressEvent.replay_completed_counts(), {self.user.pk: 1})
+
+@override_settings(PROGRESS_EVENT_BATCH_SIZE=3, PROGRESS_EVENT_MAX_DELAY=0.2, PROGRESS_EVENT_ASYNC=True)
+class ProgressEventWriterTests(TransactionTestCase):
+    """
+    Tests for the batched, background event writer
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='learner', password='pass12345')
+        topic = Topic.objects.create(title='Topic')
+        self.content = Content.objects.create(topic=topic, title='Content', content_type='video', url='https://example.com/v')
+
+    def record(self, count):
+        events.record_events([
+            ProgressEvent(user=self.user, content=self.content, completed=i % 2 == 0) for i in range(count)
+        ])
+
+    def test_full_batch_is_written_in_the_background(self):
+        self.record(3)
+        # The writer has a single thread, so this waits for the flush
+        events._get_executor().submit(lambda: None).result(timeout=5)
+        self.assertEqual(ProgressEvent.objects.count(), 3)
+
+    def test_idle_worker_writes_after_the_delay(self):
+        self.record(1)
+        timer = events._timer
+        self.assertEqual(ProgressEvent.objects.count(), 0)
+        timer.join(timeout=5)
+        self.assertEqual(ProgressEvent.objects.count(), 1)
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    Tests that the per-user progress reads are served by indexes
+    """
+    @classmethod
+    def setUpTestData(cls):
+        topic = Topic.objects.create(title='Topic')
+        Content.objects.bulk_create([
+            Content(topic=topic, title=f"Content {i}", content_type='video', url='https://example.com/video', order=i)
+            for i in range(500)
+        ])
+        cls.content_ids = list(Content.objects.values_list('id', flat=True))
+        cls.users = User.objects.bulk_create([User(username=f"learner{i}") for i in range(20)])
+        Progress.objects.bulk_create([
+            Progress(user=user, content_id=content_id, completed=content_id % 3 == 0)
+            for user in cls.users
+            for content_id in cls.content_ids
+        ])
+        analyze()
+
+    def test_progress_map(self):
+        self.assertIndexed(
+            Progress.objects.filter(user=self.users[0], completed=True).values_list('content_id', 'completed_at')
+        )
+
+    def test_completed_flags(self):
+        self.assertIndexed(Progress.objects.filter(
+            user=self.users[0], completed=True, content_id__in=self.content_ids[:20]
+        ).values_list('content_id', flat=True))
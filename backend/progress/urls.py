@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from .views import ProgressUpdateView, OverallProgressView
+from .views import ProgressMapView, ProgressUpdateView, BulkProgressUpdateView, OverallProgressView, AsyncOverallProgressView
+
+if settings.ASYNC_READ_VIEWS:
+    OverallProgressView = AsyncOverallProgressView
 
 urlpatterns = [
+    path('', ProgressMapView.as_view(), name='progress-map'),
     path('content/<int:content_id>/', ProgressUpdateView.as_view(), name='progress-update'),
+    path('bulk/', BulkProgressUpdateView.as_view(), name='progress-bulk'),
     path('overall/', OverallProgressView.as_view(), name='overall-progress'),
 ]
@@ -1,11 +1,37 @@
-from rest_framework import generics, permissions, status
+from rest_framework import generics, permissions, serializers, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db import transaction
 from django.utils import timezone
-from .models import Progress, OverallProgress
-from .serializers import ProgressSerializer, OverallProgressSerializer
+from takeyouforward.async_views import AsyncAPIView
+from takeyouforward.conditional import ConditionalGetMixin, queryset_state
+from .events import record_events
+from .models import Progress, OverallProgress, ProgressEvent
+from .serializers import ProgressSerializer, OverallProgressSerializer, BulkProgressItemSerializer
+from topics.catalog import aget_catalog_size, get_catalog_size
 from topics.models import Content
 
+class ProgressMapView(ConditionalGetMixin, generics.RetrieveAPIView):
+    """
+    View for the current user's completion state as {content_id: completed_at}
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_progress(self):
+        return Progress.objects.filter(user=self.request.user).order_by()
+
+    def get_conditional_states(self):
+        return [queryset_state(self.get_progress())]
+
+    def retrieve(self, request, *args, **kwargs):
+        completed = {
+            content_id: completed_at
+            for content_id, completed_at in self.get_progress().filter(completed=True).values_list(
+                'content_id', 'completed_at'
+            ).iterator()
+        }
+        return Response(completed)
+
 class ProgressUpdateView(APIView):
     """
     View for updating progress on a content item
@@ -15,31 +41,108 @@ class ProgressUpdateView(APIView):
     def post(self, request, content_id):
         try:
             content = Content.objects.get(id=content_id)
-            progress, created = Progress.objects.get_or_create(
-                user=request.user,
-                content=content,
-                defaults={'completed': False}
-            )
-
-            # Update progress
-            progress.completed = request.data.get('completed', False)
-            if progress.completed and not progress.completed_at:
-                progress.completed_at = timezone.now()
-            progress.save()
-
-            # Update overall progress
-            overall_progress, _ = OverallProgress.objects.get_or_create(user=request.user)
-            completed_count = Progress.objects.filter(user=request.user, completed=True).count()
-            total_count = Content.objects.count()
-
-            overall_progress.total_completed = completed_count
-            overall_progress.total_items = total_count
-            overall_progress.save()
+            with transaction.atomic():
+                progress, created = Progress.objects.select_for_update().get_or_create(
+                    user=request.user,
+                    content=content,
+                    defaults={'completed': False}
+                )
+                progress.content = content  # Reuse the loaded content for the response
+                was_completed = progress.completed
+
+                # Update progress, parsing form values like "false" as booleans
+                progress.completed = serializers.BooleanField().to_internal_value(request.data.get('completed', False))
+                if progress.completed and not progress.completed_at:
+                    progress.completed_at = timezone.now()
+                progress.save()
+
+                # Adjust the overall counters only by what actually changed
+                delta = int(progress.completed) - int(was_completed)
+                OverallProgress.record_change(request.user, delta)
+                if delta:
+                    record_events([ProgressEvent(
+                        user=request.user, content=content, completed=progress.completed
+                    )])
 
             return Response(ProgressSerializer(progress).data)
         except Content.DoesNotExist:
             return Response({"error": "Content not found"}, status=status.HTTP_404_NOT_FOUND)
 
+class BulkProgressUpdateView(APIView):
+    """
+    View for applying a batch of progress updates in one transaction
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    max_items = 500
+
+    def post(self, request):
+        # Refuse oversized batches before paying for their validation
+        if isinstance(request.data, list) and len(request.data) > self.max_items:
+            return Response({"error": f"At most {self.max_items} items can be updated at once"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = BulkProgressItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # Later entries for the same content win, as if replayed in order
+        updates = {item['content_id']: item['completed'] for item in serializer.validated_data}
+        now = timezone.now()
+
+        with transaction.atomic():
+            known_ids = set(Content.objects.filter(id__in=updates).order_by().values_list('id', flat=True))
+            existing = {
+                progress.content_id: progress
+                for progress in Progress.objects.select_for_update().filter(
+                    user=request.user, content_id__in=known_ids
+                )
+            }
+
+            rows, results, events, delta = [], [], [], 0
+            for content_id, completed in updates.items():
+                if content_id not in known_ids:
+                    results.append({'content_id': content_id, 'status': 'not_found'})
+                    continue
+
+                previous = existing.get(content_id)
+                was_completed = previous.completed if previous else False
+                completed_at = previous.completed_at if previous else None
+                if completed and not completed_at:
+                    completed_at = now
+
+                if previous is None:
+                    result_status = 'created'
+                elif completed != was_completed or completed_at != previous.completed_at:
+                    result_status = 'updated'
+                else:
+                    result_status = 'unchanged'
+                if result_status != 'unchanged':
+                    rows.append(Progress(
+                        user=request.user,
+                        content_id=content_id,
+                        completed=completed,
+                        completed_at=completed_at
+                    ))
+                delta += int(completed) - int(was_completed)
+                if completed != was_completed:
+                    events.append(ProgressEvent(user=request.user, content_id=content_id, completed=completed, created_at=now))
+                results.append({
+                    'content_id': content_id,
+                    'status': result_status,
+                    'completed': completed,
+                    'completed_at': completed_at,
+                })
+
+            if rows:
+                Progress.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=['user', 'content'],
+                    update_fields=['completed', 'completed_at', 'updated_at'],
+                )
+                OverallProgress.record_change(request.user, delta)
+            record_events(events)
+
+        return Response({'results': results})
+
 class OverallProgressView(generics.RetrieveAPIView):
     """
     View for retrieving overall progress
@@ -51,11 +154,25 @@ class OverallProgressView(generics.RetrieveAPIView):
         overall_progress, created = OverallProgress.objects.get_or_create(user=self.request.user)
         if created:
             # Initialize with correct counts
-            completed_count = Progress.objects.filter(user=self.request.user, completed=True).count()
-            total_count = Content.objects.count()
-
-            overall_progress.total_completed = completed_count
-            overall_progress.total_items = total_count
+            overall_progress.total_completed = Progress.objects.filter(user=self.request.user, completed=True).count()
+            overall_progress.total_items = get_catalog_size()
             overall_progress.save()
+        else:
+            # The catalog may have changed since the user's last update
+            overall_progress.total_items = get_catalog_size()
 
         return overall_progress
+
+class AsyncOverallProgressView(AsyncAPIView):
+    """
+    Async variant of OverallProgressView, routed instead of it under ASGI
+    """
+    async def get_data(self, request, *args, **kwargs):
+        overall_progress, created = await OverallProgress.objects.aget_or_create(user=request.user)
+        if created:
+            overall_progress.total_completed = await Progress.objects.filter(user=request.user, completed=True).acount()
+            overall_progress.total_items = await aget_catalog_size()
+            await overall_progress.asave()
+        else:
+            overall_progress.total_items = await aget_catalog_size()
+        return OverallProgressSerializer(overall_progress).data
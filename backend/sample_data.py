@@ -15,22 +15,19 @@ def create_sample_data():
     linear_algebra = Topic.objects.create(
         title="Linear Algebra",
         description="Learn the fundamentals of linear algebra, including vectors, matrices, and transformations.",
-        order=1,
-        total_items=14
+        order=1
     )
     
     calculus = Topic.objects.create(
         title="Calculus",
         description="Master differential and integral calculus concepts and applications.",
-        order=2,
-        total_items=12
+        order=2
     )
     
     probability = Topic.objects.create(
         title="Probability & Statistics",
         description="Understand probability theory, statistical inference, and data analysis.",
-        order=3,
-        total_items=10
+        order=3
     )
     
     # Create subtopics for Linear Algebra
@@ -38,24 +35,21 @@ def create_sample_data():
         title="Vectors and Vector Spaces",
         description="Learn about vectors, vector operations, and vector spaces.",
         order=1,
-        parent=linear_algebra,
-        total_items=4
+        parent=linear_algebra
     )
     
     matrices = Topic.objects.create(
         title="Matrices and Linear Transformations",
         description="Understand matrices, matrix operations, and linear transformations.",
         order=2,
-        parent=linear_algebra,
-        total_items=5
+        parent=linear_algebra
     )
     
     eigenvalues = Topic.objects.create(
         title="Eigenvalues and Eigenvectors",
         description="Learn about eigenvalues, eigenvectors, and their applications.",
         order=3,
-        parent=linear_algebra,
-        total_items=3
+        parent=linear_algebra
     )
     
     # Create content for Vectors subtopic
@@ -174,24 +168,21 @@ def create_sample_data():
         title="Limits and Continuity",
         description="Learn about limits, continuity, and their applications.",
         order=1,
-        parent=calculus,
-        total_items=3
+        parent=calculus
     )
     
     derivatives = Topic.objects.create(
         title="Derivatives",
         description="Understand derivatives, differentiation rules, and applications.",
         order=2,
-        parent=calculus,
-        total_items=4
+        parent=calculus
     )
     
     integrals = Topic.objects.create(
         title="Integrals",
         description="Learn about integrals, integration techniques, and applications.",
         order=3,
-        parent=calculus,
-        total_items=5
+        parent=calculus
     )
     
     # Create content for Limits subtopic
@@ -0,0 +1,66 @@
+"""
+Async read-only API views, for serving the hot read endpoints under ASGI.
+
+DRF's APIView is synchronous, so under ASGI every DRF request holds a
+worker thread for its whole duration. AsyncAPIView covers the part of
+APIView the read endpoints use: the configured authenticators, the
+IsAuthenticated check, 404s and JSON rendering. The authenticators may
+query the database on a cache miss, so they run in a worker thread;
+subclasses produce their data with the async ORM on the event loop.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+def authenticate(request, authenticators):
+    """
+    Return (user, auth) for a request, as DRF would resolve them
+    """
+    drf_request = Request(request, authenticators=authenticators)
+    return drf_request.user, drf_request.auth
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of an authenticated, read-only APIView.
+
+    Subclasses implement `async def get_data(request, **kwargs)`, which
+    returns the data to render or raises Http404.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    http_method_names = ['get', 'head', 'options']
+
+    def get_authenticators(self):
+        return [auth() for auth in self.authentication_classes]
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticators = self.get_authenticators()
+        try:
+            request.user, request.auth = await sync_to_async(authenticate)(request, authenticators)
+            if not request.user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404 as exc:
+            return self.handle_exception(exceptions.NotFound(*exc.args), authenticators)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc, authenticators)
+
+    def handle_exception(self, exc, authenticators):
+        response = self.render({'detail': exc.detail}, exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)) and authenticators:
+            response['WWW-Authenticate'] = authenticators[0].authenticate_header(self.request)
+        return response
+
+    def render(self, data, status=200):
+        return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+    async def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def get(self, request, *args, **kwargs):
+        return self.render(await self.get_data(request, *args, **kwargs))
@@ -0,0 +1,92 @@
+"""
+Conditional GET support (ETag) for the API views.
+
+A view describes its response by a list of "states": (count, last
+modified) pairs aggregated from the rows it reads. Any write bumps an
+updated_at and any delete changes a count, so the states change whenever
+the response could. When the client already has them, a 304 is returned
+before the serializer runs.
+
+No Last-Modified is sent: deleting a row never moves the latest
+updated_at forward, so If-Modified-Since could not see deletes.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+
+def queryset_state(queryset, field='updated_at'):
+    """
+    Return the (count, latest `field`) pair of a queryset in one aggregate
+    """
+    state = queryset.order_by().aggregate(count=Count('pk'), last_modified=Max(field))
+    return state['count'], state['last_modified']
+
+
+async def aqueryset_state(queryset, field='updated_at'):
+    state = await queryset.order_by().aaggregate(count=Count('pk'), last_modified=Max(field))
+    return state['count'], state['last_modified']
+
+
+def make_etag(*states, user_id=None):
+    """
+    Return the ETag of a response, scoped to the user it was rendered for
+    """
+    fingerprint = f"{user_id}|" + '|'.join(f"{count}:{last_modified}" for count, last_modified in states)
+    return quote_etag(hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest())
+
+
+def set_validators(response, etag):
+    response['ETag'] = etag
+    # Responses are per user and must be revalidated before every reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Adds an ETag header to GET responses and answers matching
+    If-None-Match requests with a 304.
+
+    Views implement get_conditional_states() to return the states that
+    describe their response.
+    """
+    def get_conditional_states(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        states = self.get_conditional_states()
+        etag = make_etag(*states, user_id=request.user.pk)
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return set_validators(not_modified, etag)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag)
+        return response
+
+
+class AsyncConditionalGetMixin:
+    """
+    ConditionalGetMixin for async views, whose get_conditional_states()
+    is a coroutine
+    """
+    async def get_conditional_states(self):
+        raise NotImplementedError
+
+    async def get(self, request, *args, **kwargs):
+        states = await self.get_conditional_states()
+        etag = make_etag(*states, user_id=request.user.pk)
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return set_validators(not_modified, etag)
+
+        response = await super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag)
+        return response
@@ -0,0 +1,187 @@
+"""
+Per-request SQL and timing instrumentation.
+
+For a sampled share of requests (REQUEST_METRICS_SAMPLE_RATE), the
+middleware wraps every query the request runs, times the serializers
+that use TimedSerializerMixin, and reports the query count, database time,
+serializer time and response size. They go out both as a
+`Server-Timing` header and as a JSON log line on the
+`takeyouforward.requests` logger. Queries are grouped by a fingerprint
+of their SQL, with literals and IN lists collapsed. Groups repeated
+REQUEST_METRICS_DUPLICATE_THRESHOLD times or more are logged as
+duplicates, which is how N+1 patterns show up. Requests that are not
+sampled only pay for one random number and a context lookup per query.
+
+Every connection gets one permanent execute wrapper that reports to the
+metrics of the request in the current context. Async views run their
+queries in sync_to_async threads, each with its own connections, and the
+context follows them there.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('takeyouforward.requests')
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Return a short hash identifying queries that differ only in their
+    parameters
+    """
+    normalized = _IN_LIST.sub('(...)', _STRING.sub('?', _NUMBER.sub('?', _SPACE.sub(' ', sql))))
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+class RequestMetrics:
+    """
+    Measurements collected while one request is being handled
+    """
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.fingerprints = Counter()
+        self.samples = {}
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper timing each query
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] += 1
+            self.samples.setdefault(key, sql)
+
+    def duplicates(self, threshold):
+        return [
+            {'fingerprint': key, 'count': count, 'sql': self.samples[key]}
+            for key, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install_wrapper(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin counting to_representation() towards the serializer
+    time of the request being measured
+    """
+    def to_representation(self, instance):
+        metrics = _current.get()
+        # Only the outermost serializer is timed, nested ones are part of it
+        if metrics is None or metrics._serializing:
+            return super().to_representation(instance)
+        metrics._serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics._serializing = False
+
+
+class RequestMetricsMiddleware:
+    """
+    Report the SQL and timing cost of a sample of requests
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened from now on, in any thread
+        connection_created.connect(_install_wrapper, dispatch_uid='request-metrics')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with self.instrument() as metrics:
+            response = self.get_response(request)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with self.instrument() as metrics:
+            response = await self.get_response(request)
+        return self.report(request, response, metrics, time.perf_counter() - started)
+
+    @contextmanager
+    def instrument(self):
+        # Connections this thread opened before the middleware was loaded
+        for connection in connections.all():
+            _install_wrapper(connection=connection)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            yield metrics
+        finally:
+            _current.reset(token)
+
+    def report(self, request, response, metrics, total):
+        size = None if response.streaming else len(response.content)
+        duplicates = metrics.duplicates(settings.REQUEST_METRICS_DUPLICATE_THRESHOLD)
+        response['Server-Timing'] = ', '.join(filter(None, [
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serializer_time * 1000:.1f}',
+            f'dup;desc="{len(duplicates)} repeated queries"' if duplicates else None,
+            f'total;dur={total * 1000:.1f}',
+        ]))
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 2),
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'serializer_ms': round(metrics.serializer_time * 1000, 2),
+            'response_bytes': size,
+            'duplicates': duplicates,
+        }
+        logger.log(logging.WARNING if duplicates else logging.INFO, json.dumps(record), extra={'metrics': record})
+        return response
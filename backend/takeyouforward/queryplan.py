@@ -0,0 +1,59 @@
+"""
+Query plan inspection for the hot ORM paths.
+
+`sequential_scans` runs EXPLAIN for a queryset and returns the plan lines
+that read a whole table or index instead of searching an index: `Seq
+Scan` on PostgreSQL and any `SCAN` on SQLite, where only `SEARCH` is an
+index lookup. A full walk over an index (`SCAN ... USING [COVERING]
+INDEX`) is only accepted with `index_walks=True`, for a LIMITed ORDER BY
+on an indexed column, which stops after the first rows.
+
+On PostgreSQL the plan is taken with sequential scans disabled, so small
+test tables do not hide a missing index: a `Seq Scan` that still shows up
+means no index can serve the query at all.
+"""
+import re
+
+from django.db import connection, transaction
+
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r'\bSeq Scan on\b'),
+    'sqlite': re.compile(r'\bSCAN\b'),
+}
+# Full index walks; on PostgreSQL these are not Seq Scans in the first place
+INDEX_WALK = re.compile(r'\bSCAN .*\bUSING (COVERING )?INDEX\b')
+
+
+def sequential_scans(queryset, index_walks=False):
+    """
+    Return the lines of the queryset's plan that scan a whole table, or a
+    whole index unless `index_walks`
+    """
+    pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+    if pattern is None:
+        return []
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+    return [
+        line.strip() for line in plan.splitlines()
+        if pattern.search(line) and not (index_walks and INDEX_WALK.search(line))
+    ]
+
+
+def analyze():
+    """
+    Refresh the planner statistics, so plans reflect the current data
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+class QueryPlanAssertions:
+    """
+    TestCase mixin asserting that querysets are served by indexes
+    """
+    def assertIndexed(self, queryset, index_walks=False):
+        self.assertEqual(sequential_scans(queryset, index_walks=index_walks), [], queryset.explain())
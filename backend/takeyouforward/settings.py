@@ -63,6 +63,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'takeyouforward.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -107,6 +108,39 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# CACHE_BACKEND selects local memory (default), a file-based cache, or any
+# Redis-compatible server (Redis, Valkey, KeyDB; through the redis package)
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_LOCATIONS = {
+    'locmem': 'takeyouforward',
+    'file': str(BASE_DIR / 'cache'),
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_LOCATIONS[CACHE_BACKEND]),
+    }
+}
+
+# The versioned catalog cache needs a cache shared by every worker: under
+# locmem an edit would only bump the version in the worker that handled it,
+# so it is off by default there
+CATALOG_CACHE = os.environ.get('CATALOG_CACHE', str(CACHE_BACKEND != 'locmem')).lower() == 'true'
+# Seconds a cached catalog response is kept; edits bump the catalog version
+# so this only bounds how long orphaned entries linger
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 3600))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -167,18 +201,79 @@ if not DEBUG and os.environ.get('CORS_ALLOWED_ORIGINS'):
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+        'users.tokens.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Reverse proxies in front of the app. Client IPs (login limits) come
+    # from X-Forwarded-For only behind that many trusted proxies, otherwise
+    # from REMOTE_ADDR, since clients can send any X-Forwarded-For.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
+# In-process cache of authenticated tokens (see users.authentication). Other
+# workers see a deactivation or a rotated token after at most the TTL.
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 10000))
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 30))
+
+# Signed access tokens with rotating refresh tokens (see users.tokens),
+# issued by the login views next to the regular token when enabled.
+# Revocations need a shared cache backend to reach every worker.
+SIGNED_ACCESS_TOKENS = os.environ.get('SIGNED_ACCESS_TOKENS', 'False').lower() == 'true'
+ACCESS_TOKEN_LIFETIME = int(os.environ.get('ACCESS_TOKEN_LIFETIME', 300))
+REFRESH_TOKEN_LIFETIME = int(os.environ.get('REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600))
+
+# Failed login attempts allowed per client IP and per account within
+# LOGIN_FAILURE_WINDOW seconds (see users.login)
+LOGIN_FAILURE_WINDOW = int(os.environ.get('LOGIN_FAILURE_WINDOW', 900))
+LOGIN_FAILURE_IP_LIMIT = int(os.environ.get('LOGIN_FAILURE_IP_LIMIT', 20))
+LOGIN_FAILURE_ACCOUNT_LIMIT = int(os.environ.get('LOGIN_FAILURE_ACCOUNT_LIMIT', 5))
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 # Custom User model
 AUTH_USER_MODEL = 'users.User'
+
+# Count subtopic contents in each ancestor's Topic.total_items
+TOPIC_TOTAL_ITEMS_INCLUDE_SUBTREE = os.environ.get('TOPIC_TOTAL_ITEMS_INCLUDE_SUBTREE', 'True').lower() == 'true'
+
+# Space topic and content orders this far apart on bulk reorders, so most
+# moves rewrite one row (see topics.ordering); 0 numbers them 1, 2, 3...
+REORDER_GAP = int(os.environ.get('REORDER_GAP', 0))
+
+# Route the topic and overall progress reads to their async views. The ASGI
+# entry point (takeyouforward.asgi) enables this unless it is set.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False').lower() == 'true'
+
+# Seconds before the admin dashboard statistics snapshot is reported stale
+DASHBOARD_STATS_MAX_AGE = int(os.environ.get('DASHBOARD_STATS_MAX_AGE', 900))
+
+# Batching of the append-only ProgressEvent log (see progress.events)
+PROGRESS_EVENT_BATCH_SIZE = int(os.environ.get('PROGRESS_EVENT_BATCH_SIZE', 50))
+PROGRESS_EVENT_MAX_DELAY = float(os.environ.get('PROGRESS_EVENT_MAX_DELAY', 5))
+PROGRESS_EVENT_ASYNC = os.environ.get('PROGRESS_EVENT_ASYNC', 'True').lower() == 'true'
+
+# Share of requests instrumented by takeyouforward.middleware (0 disables it)
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', 1 if DEBUG else 0.05))
+# Identical queries repeated this often in one request are logged as N+1
+REQUEST_METRICS_DUPLICATE_THRESHOLD = int(os.environ.get('REQUEST_METRICS_DUPLICATE_THRESHOLD', 3))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.environ.get('LOG_LEVEL', 'INFO'),
+    },
+}
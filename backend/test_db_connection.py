@@ -41,18 +41,14 @@ def test_database_connection():
         print(f"✅ Successfully connected to Topic table")
         print(f"   - {topic_count} topics in the database")
         
-        # List main topics
-        main_topics = Topic.objects.filter(parent=None)
-        print(f"   - {main_topics.count()} main topics:")
-        for topic in main_topics:
-            print(f"     * {topic.title} (ID: {topic.id})")
-            
-            # List subtopics
-            subtopics = Topic.objects.filter(parent=topic)
-            if subtopics.exists():
-                print(f"       Subtopics:")
-                for subtopic in subtopics:
-                    print(f"       - {subtopic.title} (ID: {subtopic.id})")
+        # List the topic tree in one query, ordered by materialized path
+        main_topics = 0
+        for topic in Topic.objects.order_by('path'):
+            depth = topic.path.count('/') - 1
+            if depth == 0:
+                main_topics += 1
+            print(f"     {'  ' * depth}* {topic.title} (ID: {topic.id})")
+        print(f"   - {main_topics} main topics")
     except Exception as e:
         print(f"❌ Error connecting to Topic table: {str(e)}")
     
@@ -0,0 +1,144 @@
+"""
+Cached catalog-wide data.
+
+The catalog (topics, subtopics and contents) only changes when an admin
+edits it, so the user-independent parts of the catalog responses are
+cached under a version number that topics.signals bumps on every write.
+Bumping the version orphans all older entries at once; they simply expire.
+The version must be seen by every worker, so this cache is only on
+(CATALOG_CACHE) with a shared cache backend; otherwise entries are built
+on every call.
+
+Counting the whole Content table on every progress write does not scale
+either, so that count is cached too and dropped whenever content is
+created or deleted.
+
+The `a`-prefixed functions are the same lookups for async views, going
+through the async cache and ORM APIs.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+CATALOG_SIZE_KEY = 'topics:catalog-size'
+# Bounds the drift between processes that do not share a cache backend
+CATALOG_SIZE_TIMEOUT = 300
+
+CATALOG_VERSION_KEY = 'topics:catalog-version'
+
+
+def get_catalog_size():
+    """
+    Return the total number of content items, counting only on a cache miss
+    """
+    from .models import Content
+    return cache.get_or_set(CATALOG_SIZE_KEY, Content.objects.count, CATALOG_SIZE_TIMEOUT)
+
+
+async def aget_catalog_size():
+    from .models import Content
+    size = await cache.aget(CATALOG_SIZE_KEY)
+    if size is None:
+        size = await Content.objects.acount()
+        await cache.aset(CATALOG_SIZE_KEY, size, CATALOG_SIZE_TIMEOUT)
+    return size
+
+
+def invalidate_catalog_size():
+    cache.delete(CATALOG_SIZE_KEY)
+
+
+def get_catalog_version():
+    """
+    Return the current catalog version.
+
+    A missing version (first use or eviction) restarts from the current
+    time in milliseconds, so it can never collide with an older version
+    whose entries may still be cached.
+    """
+    return cache.get_or_set(CATALOG_VERSION_KEY, lambda: int(time.time() * 1000), None)
+
+
+async def aget_catalog_version():
+    return await cache.aget_or_set(CATALOG_VERSION_KEY, lambda: int(time.time() * 1000), None)
+
+
+def bump_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+
+
+def get_cached_catalog(name, build):
+    """
+    Return the cached catalog entry `name` for the current version, calling
+    `build()` to produce and store it on a miss
+    """
+    if not settings.CATALOG_CACHE:
+        return build()
+    key = f"topics:catalog:{get_catalog_version()}:{name}"
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+    return data
+
+
+async def aget_cached_catalog(name, build):
+    """
+    get_cached_catalog() with a coroutine function as `build`
+    """
+    if not settings.CATALOG_CACHE:
+        return await build()
+    key = f"topics:catalog:{await aget_catalog_version()}:{name}"
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+    return data
+
+
+def get_catalog_states(name, querysets):
+    """
+    Return the (count, last modified) states of the catalog rows behind a
+    response, given by a function returning their querysets, for
+    conditional GETs. Cached per catalog version under `name`.
+    """
+    from takeyouforward.conditional import queryset_state
+    return get_cached_catalog(f"states:{name}", lambda: [queryset_state(queryset) for queryset in querysets()])
+
+
+async def aget_catalog_states(name, querysets):
+    """
+    get_catalog_states() with a coroutine function as `querysets`
+    """
+    from takeyouforward.conditional import aqueryset_state
+
+    async def build():
+        return [await aqueryset_state(queryset) for queryset in await querysets()]
+    return await aget_cached_catalog(f"states:{name}", build)
+
+
+def topic_list_querysets():
+    """
+    The rows behind the root topic list: the roots, and their subtopics
+    for the subtopic counts
+    """
+    from .models import Topic
+    roots = Topic.objects.filter(parent=None)
+    return [roots, Topic.objects.filter(parent__in=roots.values('pk'))]
+
+
+def topic_querysets(topic_id, path):
+    """
+    The rows behind a topic detail: the topic with its ancestors (from its
+    stored `path`) and subtopics, and its contents
+    """
+    from .models import Topic, Content, path_ids
+    return [
+        Topic.objects.filter(Q(pk__in=path_ids(path) or [topic_id]) | Q(parent_id=topic_id)),
+        Content.objects.filter(topic_id=topic_id),
+    ]
@@ -0,0 +1,349 @@
+"""
+Bulk import of a catalog of topics and contents.
+
+Every imported topic and content has an id of the import's choosing,
+stored as `external_id`, so importing a file again updates its rows
+rather than duplicating them. A catalog is a JSON tree (see parse_tree)
+or a flat CSV file (see parse_csv). It is validated in memory first, then
+written in one transaction:
+
+- topics are upserted level by level, roots first, with
+  bulk_create(update_conflicts=True), which gives each level the primary
+  keys of its parents. Paths are then computed in memory and written
+  with one bulk_update,
+- contents are upserted in batches the same way,
+- total_items is recomputed once and the catalog caches are dropped.
+
+Bulk writes send no signals, so none of the per-row bookkeeping of
+topics.signals runs.
+"""
+import csv
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
+
+from .catalog import bump_catalog_version, invalidate_catalog_size
+from .models import PATH_SEPARATOR, Topic, Content, path_ids
+
+CONTENT_TYPES = {content_type for content_type, _ in Content.CONTENT_TYPES}
+CSV_COLUMNS = ['type', 'id', 'parent', 'title', 'description', 'order', 'content_type', 'url']
+# Validation stops reporting after this many errors
+MAX_ERRORS = 100
+
+_validate_url = URLValidator()
+
+
+class CatalogImportError(Exception):
+    def __init__(self, errors):
+        super().__init__(f"Invalid catalog: {len(errors)} errors")
+        self.errors = errors[:MAX_ERRORS]
+
+
+def parse_tree(nodes):
+    """
+    Flatten a JSON tree into (topics, contents) rows.
+
+    `nodes` is a list of topics. A topic has an `id`, `title` and
+    optionally `description`, `order`, `subtopics` and `contents`; a
+    content has an `id`, `title`, `content_type`, `url` and optionally
+    `description` and `order`. Root topics may name an existing topic's
+    id as their `parent`. A missing order is the position in the list.
+    """
+    if not isinstance(nodes, list):
+        raise CatalogImportError([{'at': '', 'error': 'Expected a list of topics.'}])
+    topics, contents, errors = [], [], []
+    stack = [(node, node.get('parent') if isinstance(node, dict) else None, f"[{i}]", i)
+             for i, node in enumerate(nodes)]
+    while stack:
+        node, parent, at, position = stack.pop()
+        if not isinstance(node, dict):
+            errors.append({'at': at, 'error': 'Expected an object.'})
+            continue
+        topics.append({**_fields(node, ['id', 'title', 'description', 'order'], position), 'parent': parent, 'at': at})
+        children = {}
+        for key in ('subtopics', 'contents'):
+            children[key] = node.get(key) or []
+            if not isinstance(children[key], list):
+                errors.append({'at': f"{at}.{key}", 'error': 'Expected a list.'})
+                children[key] = []
+        for i, content in enumerate(children['contents']):
+            if not isinstance(content, dict):
+                errors.append({'at': f"{at}.contents[{i}]", 'error': 'Expected an object.'})
+                continue
+            contents.append({
+                **_fields(content, ['id', 'title', 'content_type', 'url', 'description', 'order'], i),
+                'topic': node.get('id'),
+                'at': f"{at}.contents[{i}]",
+            })
+        for i, child in enumerate(children['subtopics']):
+            stack.append((child, node.get('id'), f"{at}.subtopics[{i}]", i))
+    if errors:
+        raise CatalogImportError(errors)
+    return topics, contents
+
+
+def parse_csv(text):
+    """
+    Read (topics, contents) rows from CSV text with the CSV_COLUMNS
+    header. `type` is "topic" or "content"; `parent` is the id of a
+    topic's parent or of a content's topic. A missing order is the
+    position among the rows with the same parent.
+    """
+    reader = csv.DictReader(text.splitlines())
+    missing = {'type', 'id', 'title'} - set(reader.fieldnames or [])
+    if missing:
+        raise CatalogImportError([{'at': 'header', 'error': f"Missing columns: {', '.join(sorted(missing))}."}])
+    topics, contents, errors = [], [], []
+    positions = defaultdict(int)
+    for row in reader:
+        at = f"line {reader.line_num}"
+        kind = (row.get('type') or '').strip().lower()
+        parent = (row.get('parent') or '').strip() or None
+        position = positions[kind, parent]
+        positions[kind, parent] += 1
+        if kind == 'topic':
+            topics.append({**_fields(row, ['id', 'title', 'description', 'order'], position), 'parent': parent, 'at': at})
+        elif kind == 'content':
+            contents.append({
+                **_fields(row, ['id', 'title', 'content_type', 'url', 'description', 'order'], position),
+                'topic': parent,
+                'at': at,
+            })
+        else:
+            errors.append({'at': at, 'error': 'type must be "topic" or "content".'})
+    if errors:
+        raise CatalogImportError(errors)
+    return topics, contents
+
+
+def _fields(source, names, position):
+    row = {name: source.get(name) for name in names}
+    if row.get('order') in (None, ''):
+        row['order'] = position + 1
+    return row
+
+
+def _clean(row, errors):
+    """
+    Normalize one row in place, appending any problems to `errors`
+    """
+    def error(message):
+        errors.append({'at': row['at'], 'id': row.get('id'), 'error': message})
+
+    for name in ('id', 'parent', 'topic'):
+        if row.get(name) is not None:
+            row[name] = str(row[name]).strip() or None
+    for name in ('title', 'description', 'content_type', 'url'):
+        if name in row:
+            row[name] = '' if row[name] is None else str(row[name]).strip()
+
+    if not row['id']:
+        error('id is required.')
+    elif len(row['id']) > 100:
+        error('id is longer than 100 characters.')
+    if not row['title']:
+        error('title is required.')
+    elif len(row['title']) > 255:
+        error('title is longer than 255 characters.')
+    try:
+        row['order'] = int(row['order'])
+    except (TypeError, ValueError):
+        error('order must be an integer.')
+    if 'url' in row:
+        if not row['topic']:
+            error('A content needs a topic.')
+        if row['content_type'] not in CONTENT_TYPES:
+            error(f"content_type must be one of {', '.join(sorted(CONTENT_TYPES))}.")
+        if len(row['url']) > 200:
+            error('url is longer than 200 characters.')
+        else:
+            try:
+                _validate_url(row['url'])
+            except ValidationError:
+                error('url is not a valid URL.')
+
+
+def _existing(model, external_ids, batch_size):
+    """
+    Return {external_id: (pk, path or None)} of the stored rows among
+    `external_ids`, in batches that stay under query parameter limits
+    """
+    fields = ['external_id', 'pk', 'path'] if model is Topic else ['external_id', 'pk']
+    external_ids = list(external_ids)
+    found = {}
+    for start in range(0, len(external_ids), batch_size):
+        for external_id, pk, *path in model.objects.filter(
+            external_id__in=external_ids[start:start + batch_size]
+        ).values_list(*fields):
+            found[external_id] = (pk, path[0] if path else None)
+    return found
+
+
+def _levels(topics, errors):
+    """
+    Group topics by depth within the import, roots first
+    """
+    ids = {topic['id'] for topic in topics}
+    children = defaultdict(list)
+    level = []
+    for topic in topics:
+        if topic['parent'] in ids:
+            children[topic['parent']].append(topic)
+        else:
+            level.append(topic)
+    levels, placed = [], 0
+    while level:
+        levels.append(level)
+        placed += len(level)
+        level = [child for topic in level for child in children.pop(topic['id'], [])]
+    if placed < len(topics):
+        for topic in (topic for group in children.values() for topic in group):
+            errors.append({'at': topic['at'], 'id': topic['id'], 'error': 'Topic is its own ancestor.'})
+    return levels
+
+
+def _paths(topics, stored, pks):
+    """
+    Return the new path of every imported topic, by external id.
+
+    A stored parent outside the import keeps its path, unless one of
+    its ancestors is imported and moves, taking it along.
+    """
+    parents = {topic['id']: topic['parent'] for topic in topics}
+    imported_pks = {pks[topic['id']]: topic['id'] for topic in topics}
+    paths = {}
+
+    def path_of(external_id, visiting):
+        if external_id in paths:
+            return paths[external_id]
+        if external_id in visiting:
+            raise CatalogImportError([{'at': '', 'id': external_id, 'error': 'Topic cannot move under itself.'}])
+        visiting = visiting | {external_id}
+        if external_id in parents:
+            parent = parents[external_id]
+            path = f"{path_of(parent, visiting) if parent else ''}{pks[external_id]}{PATH_SEPARATOR}"
+        else:
+            path = stored[external_id][1]
+            ancestor_ids = path_ids(path)[:-1]
+            for depth in reversed(range(len(ancestor_ids))):
+                ancestor = imported_pks.get(ancestor_ids[depth])
+                if ancestor is not None:
+                    old_prefix = PATH_SEPARATOR.join(map(str, ancestor_ids[:depth + 1])) + PATH_SEPARATOR
+                    path = path_of(ancestor, visiting) + path[len(old_prefix):]
+                    break
+        paths[external_id] = path
+        return path
+
+    return {topic['id']: path_of(topic['id'], frozenset()) for topic in topics}
+
+
+def _upsert(model, objs, update_fields, batch_size):
+    model.objects.bulk_create(
+        objs, batch_size=batch_size, update_conflicts=True, unique_fields=['external_id'],
+        update_fields=update_fields + ['updated_at'],
+    )
+    if any(obj.pk is None for obj in objs):
+        # Backends that cannot return the ids of upserted rows
+        stored = _existing(model, [obj.external_id for obj in objs], batch_size)
+        for obj in objs:
+            obj.pk = stored[obj.external_id][0]
+
+
+def import_catalog(topics, contents, batch_size=1000):
+    """
+    Validate and upsert parsed topics and contents in one transaction,
+    or raise CatalogImportError without writing anything.
+
+    Return the number of topics and contents created and updated.
+    """
+    errors = []
+    for row in (*topics, *contents):
+        _clean(row, errors)
+    for rows, kind in ((topics, 'topic'), (contents, 'content')):
+        seen = set()
+        for row in rows:
+            if row['id'] in seen:
+                errors.append({'at': row['at'], 'id': row['id'], 'error': f"Duplicate {kind} id."})
+            seen.add(row['id'])
+    if errors:
+        raise CatalogImportError(errors)
+    levels = _levels(topics, errors)
+    if errors:
+        raise CatalogImportError(errors)
+
+    with transaction.atomic():
+        topic_ids = {topic['id'] for topic in topics}
+        references = {topic['parent'] for topic in topics if topic['parent'] and topic['parent'] not in topic_ids}
+        references |= {content['topic'] for content in contents if content['topic'] not in topic_ids}
+        stored = _existing(Topic, topic_ids | references, batch_size)
+        for row in (*topics, *contents):
+            reference = row.get('parent') or row.get('topic')
+            if reference and reference not in topic_ids and reference not in stored:
+                errors.append({'at': row['at'], 'id': row['id'], 'error': f"Unknown topic {reference}."})
+        if errors:
+            raise CatalogImportError(errors)
+
+        pks = {external_id: pk for external_id, (pk, _) in stored.items()}
+        imported = []
+        for level in levels:
+            objs = [
+                Topic(
+                    external_id=topic['id'],
+                    parent_id=pks[topic['parent']] if topic['parent'] else None,
+                    title=topic['title'],
+                    description=topic['description'],
+                    order=topic['order'],
+                )
+                for topic in level
+            ]
+            _upsert(Topic, objs, ['parent', 'title', 'description', 'order'], batch_size)
+            for topic, obj in zip(level, objs):
+                pks[topic['id']] = obj.pk
+            imported += objs
+
+        paths = _paths(topics, stored, pks)
+        for obj in imported:
+            obj.path = paths[obj.external_id]
+
+        # Stored topics that moved take their unlisted descendants along,
+        # deepest first so nested moves compose
+        moved = [
+            (stored[obj.external_id][1], obj) for obj in imported
+            if obj.external_id in stored and stored[obj.external_id][1] not in ('', obj.path)
+        ]
+        for old_path, obj in sorted(moved, key=lambda move: len(move[0]), reverse=True):
+            Topic.objects.filter(path__startswith=old_path).exclude(pk=obj.pk).update(
+                path=Concat(Value(obj.path), Substr('path', len(old_path) + 1)), updated_at=timezone.now()
+            )
+        Topic.objects.bulk_update(imported, ['path'], batch_size=batch_size)
+
+        stored_contents = _existing(Content, [content['id'] for content in contents], batch_size)
+        _upsert(Content, [
+            Content(
+                external_id=content['id'],
+                topic_id=pks[content['topic']],
+                title=content['title'],
+                content_type=content['content_type'],
+                url=content['url'],
+                description=content['description'],
+                order=content['order'],
+            )
+            for content in contents
+        ], ['topic', 'title', 'content_type', 'url', 'description', 'order'], batch_size)
+
+        Topic.recompute_total_items(batch_size=batch_size)
+        # Only once committed, so readers cannot cache the old catalog
+        # under the new version, and a rolled back dry run changes nothing
+        transaction.on_commit(invalidate_catalog_size)
+        transaction.on_commit(bump_catalog_version)
+
+    updated_topics = sum(topic['id'] in stored for topic in topics)
+    return {
+        'topics': {'created': len(topics) - updated_topics, 'updated': updated_topics},
+        'contents': {'created': len(contents) - len(stored_contents), 'updated': len(stored_contents)},
+    }
@@ -0,0 +1,44 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from topics.importer import CatalogImportError, import_catalog, parse_csv, parse_tree
+
+
+class Command(BaseCommand):
+    help = 'Import or update a catalog of topics and contents from a JSON tree or a CSV file, atomically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['json', 'csv'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and import, then roll back')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if fmt not in ('json', 'csv'):
+            raise CommandError('Pass --format, the file extension is neither .json nor .csv')
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8') as f:
+                topics, contents = parse_tree(json.load(f)) if fmt == 'json' else parse_csv(f.read())
+            with transaction.atomic():
+                result = import_catalog(topics, contents, batch_size=options['batch_size'])
+                transaction.set_rollback(options['dry_run'])
+        except json.JSONDecodeError as e:
+            raise CommandError(f"Invalid JSON: {e}")
+        except CatalogImportError as e:
+            for error in e.errors:
+                self.stderr.write(f"{error['at']}: {error['error']}")
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Validated' if options['dry_run'] else 'Imported'} in {elapsed:.2f}s: "
+            f"{result['topics']['created']} topics created, {result['topics']['updated']} updated, "
+            f"{result['contents']['created']} contents created, {result['contents']['updated']} updated"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from topics.models import Topic, include_subtree_totals
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized Topic.total_items counters in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = Topic.recompute_total_items(batch_size=options['batch_size'])
+
+        scope = 'subtree' if include_subtree_totals() else 'direct'
+        self.stdout.write(self.style.SUCCESS(f"Updated {drifted} topics ({scope} totals)"))
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='topic',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['path'], name='topic_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
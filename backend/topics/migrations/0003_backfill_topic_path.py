@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def backfill_paths(apps, schema_editor):
+    """
+    Compute the materialized path of every existing topic from a single
+    load of the parent links
+    """
+    Topic = apps.get_model('topics', 'Topic')
+    parents = dict(Topic.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def build_path(topic_id):
+        if topic_id not in paths:
+            parent_id = parents[topic_id]
+            prefix = build_path(parent_id) if parent_id else ''
+            paths[topic_id] = f"{prefix}{topic_id}/"
+        return paths[topic_id]
+
+    topics = []
+    for topic_id in parents:
+        topics.append(Topic(id=topic_id, path=build_path(topic_id)))
+    Topic.objects.bulk_update(topics, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0002_topic_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0003_backfill_topic_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='topic',
+            name='total_items',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
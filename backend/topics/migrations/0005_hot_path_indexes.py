@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('topics', '0004_topic_total_items_editable'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['topic', 'order'], name='content_topic_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['-created_at'], name='content_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['parent', 'order'], name='topic_parent_order_idx'),
+        ),
+    ]
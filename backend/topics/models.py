@@ -1,4 +1,21 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
+
+PATH_SEPARATOR = '/'
+
+
+def path_ids(path):
+    """
+    Split a materialized path into its topic ids, root first
+    """
+    return [int(pk) for pk in path.split(PATH_SEPARATOR)[:-1]]
+
+
+def include_subtree_totals():
+    return getattr(settings, 'TOPIC_TOTAL_ITEMS_INCLUDE_SUBTREE', True)
 
 class Topic(models.Model):
     """
@@ -10,30 +27,137 @@ class Topic(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subtopics')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    total_items = models.IntegerField(default=0)  # Total number of content items in this topic
+    # Number of content items in this topic (and its subtree when
+    # TOPIC_TOTAL_ITEMS_INCLUDE_SUBTREE is on), maintained automatically
+    total_items = models.IntegerField(default=0, editable=False)
+    # Materialized path of ancestor ids including this topic, e.g. "1/5/12/"
+    path = models.CharField(max_length=255, editable=False, default='')
+    # Stable key given by the catalog import (see topics.importer)
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['path'], name='topic_path_idx', opclasses=['varchar_pattern_ops']),
+            # Ordered children of a topic and the root topic list
+            models.Index(fields=['parent', 'order'], name='topic_parent_order_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    # Columns written only by adjust_total_items() and update_path(). Both
+    # are served, so writing them also sets updated_at for the ETags
+    MAINTAINED_FIELDS = ('total_items', 'path')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding:
+            # A stale instance must not overwrite the maintained columns
+            fields = update_fields if update_fields is not None else [
+                field.name for field in self._meta.concrete_fields if not field.primary_key
+            ]
+            kwargs['update_fields'] = [name for name in fields if name not in self.MAINTAINED_FIELDS]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'parent' in update_fields:
+                self.update_path()
+
+    @classmethod
+    def adjust_total_items(cls, topic_id, delta):
+        """
+        Add `delta` to a topic's total_items, and to all of its ancestors'
+        when subtree totals are enabled
+        """
+        if not delta:
+            return
+        topic_ids = [topic_id]
+        if include_subtree_totals():
+            path = cls.objects.filter(pk=topic_id).values_list('path', flat=True).first()
+            topic_ids = path_ids(path) if path else topic_ids
+        cls.objects.filter(pk__in=topic_ids).update(total_items=F('total_items') + delta, updated_at=timezone.now())
+
+    @classmethod
+    def recompute_total_items(cls, batch_size=500):
+        """
+        Recompute every topic's total_items from the stored contents and
+        return the number of topics that had drifted
+        """
+        from collections import defaultdict
+        from django.db.models import Count
+
+        direct = dict(Content.objects.order_by().values_list('topic').annotate(count=Count('id')))
+        subtree = include_subtree_totals()
+
+        topics = list(cls.objects.order_by().values_list('id', 'path', 'total_items'))
+        totals = defaultdict(int)
+        for topic_id, path, _ in topics:
+            count = direct.get(topic_id, 0)
+            for counted_id in (path_ids(path) if subtree and path else [topic_id]):
+                totals[counted_id] += count
+
+        now = timezone.now()
+        drifted = [
+            cls(pk=topic_id, total_items=totals[topic_id], updated_at=now)
+            for topic_id, _, total_items in topics
+            if totals[topic_id] != total_items
+        ]
+        cls.objects.bulk_update(drifted, ['total_items', 'updated_at'], batch_size=batch_size)
+        return len(drifted)
+
+    def update_path(self):
+        """
+        Store this topic's path and rewrite the paths of its descendants
+        when the topic was created or moved
+        """
+        # Both paths are read from the database, the instance may be stale
+        stored = dict(Topic.objects.filter(pk__in=[self.pk, self.parent_id]).values_list('pk', 'path'))
+        old_path = stored[self.pk]
+        parent_path = stored[self.parent_id] if self.parent_id else ''
+        new_path = f"{parent_path}{self.pk}{PATH_SEPARATOR}"
+        if old_path == new_path:
+            self.path = new_path
+            return
+        now = timezone.now()
+        Topic.objects.filter(pk=self.pk).update(path=new_path, updated_at=now)
+        if old_path:
+            Topic.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)), updated_at=now
+            )
+            if include_subtree_totals():
+                # The moved subtree's items leave the old ancestors' totals
+                # and join the new ones
+                moved = Topic.objects.filter(pk=self.pk).values_list('total_items', flat=True).get()
+                Topic.objects.filter(pk__in=path_ids(old_path)[:-1]).update(total_items=F('total_items') - moved, updated_at=now)
+                Topic.objects.filter(pk__in=path_ids(new_path)[:-1]).update(total_items=F('total_items') + moved, updated_at=now)
+        self.path = new_path
+
+    def get_ancestor_ids(self):
+        return path_ids(self.path)[:-1]
+
+    def get_ancestors(self):
+        """
+        Return the ancestors of this topic from the root down
+        """
+        return Topic.objects.filter(pk__in=self.get_ancestor_ids()).order_by('path')
+
+    def get_descendants(self, include_self=False):
+        """
+        Return every topic in this topic's subtree
+        """
+        descendants = Topic.objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
     def get_progress_percentage(self, user):
         """
-        Calculate the progress percentage for a user on this topic
-        """
-        from progress.models import Progress
-        # Get all content IDs for this topic
-        content_ids = self.contents.values_list('id', flat=True)
-        # Count completed content items
-        completed_count = Progress.objects.filter(
-            user=user,
-            content_id__in=content_ids,
-            completed=True
-        ).count()
-        if self.total_items == 0:
-            return 0
-        return int((completed_count / self.total_items) * 100)
+        Calculate the progress percentage for a user on this topic,
+        including the contents of all of its subtopics
+        """
+        from .rollup import subtree_progress, percentage
+        completed, total = subtree_progress([self.pk], user)[self.pk]
+        return percentage(completed, total)
 
 class Content(models.Model):
     """
@@ -53,9 +177,23 @@ class Content(models.Model):
     order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Stable key given by the catalog import (see topics.importer)
+    external_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Ordered contents of a topic
+            models.Index(fields=['topic', 'order'], name='content_topic_order_idx'),
+            # Recently added content on the admin dashboard
+            models.Index(fields=['-created_at'], name='content_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.get_content_type_display()})"
+
+    def save(self, *args, **kwargs):
+        # Keep the topic counters updated by topics.signals in the same
+        # transaction as the row itself
+        with transaction.atomic():
+            super().save(*args, **kwargs)
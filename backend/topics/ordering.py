@@ -0,0 +1,116 @@
+"""
+Bulk reordering of sibling topics or of a topic's contents.
+
+A reorder takes the complete new sequence of the items and writes the
+rows whose `order` changes with one bulk_update, i.e. one UPDATE with a
+CASE per batch, in a transaction.
+
+By default the items are numbered 1, 2, 3... When REORDER_GAP is set,
+orders are spaced that many apart instead. The longest run of items
+that keep their relative order then also keeps its values, and moved
+items get values in the gaps between them, so moving one item writes
+one row. Once a gap is used up the whole list is renumbered.
+"""
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+
+
+class ReorderError(Exception):
+    pass
+
+
+def _longest_increasing(values):
+    """
+    Return the indexes of a longest strictly increasing subsequence
+    """
+    tails, tail_indexes, previous = [], [], [None] * len(values)
+    for i, value in enumerate(values):
+        position = bisect_left(tails, value)
+        if position == len(tails):
+            tails.append(value)
+            tail_indexes.append(i)
+        else:
+            tails[position] = value
+            tail_indexes[position] = i
+        previous[i] = tail_indexes[position - 1] if position else None
+    indexes, i = [], tail_indexes[-1] if tail_indexes else None
+    while i is not None:
+        indexes.append(i)
+        i = previous[i]
+    return indexes[::-1]
+
+
+def plan_orders(current, gap=0):
+    """
+    Return new order values for items whose current values, listed in
+    their new sequence, are `current`
+    """
+    if not gap:
+        return list(range(1, len(current) + 1))
+    renumbered = [gap * (i + 1) for i in range(len(current))]
+    kept = set(_longest_increasing(current))
+    planned = list(current)
+    start = 0
+    while start < len(current):
+        if start in kept:
+            start += 1
+            continue
+        end = start
+        while end < len(current) and end not in kept:
+            end += 1
+        # Fit the moved run between the values before and after it
+        low = planned[start - 1] if start else 0
+        count = end - start
+        if end == len(current):
+            step = gap
+        else:
+            step = (current[end] - low) // (count + 1)
+            if step < 1:
+                return renumbered
+        planned[start:end] = [low + step * (i + 1) for i in range(count)]
+        start = end
+    return planned
+
+
+def reorder(model, scope_field, ids, gap=None, batch_size=500):
+    """
+    Order the items `ids`, which must be every item sharing one value of
+    `scope_field` (a topic's parent, a content's topic), as listed.
+
+    Return the new {id: order} of all the items and the number of rows
+    written.
+    """
+    gap = getattr(settings, 'REORDER_GAP', 0) if gap is None else gap
+    if not ids or len(set(ids)) != len(ids):
+        raise ReorderError('ids must list each item once.')
+
+    with transaction.atomic():
+        scope = model.objects.filter(pk=ids[0]).values_list(scope_field, flat=True)
+        if not scope:
+            raise ReorderError(f"Unknown id {ids[0]}.")
+        items = {
+            item.pk: item
+            for item in model.objects.select_for_update().filter(**{scope_field: scope[0]}).only('pk', 'order')
+        }
+        if set(items) != set(ids):
+            raise ReorderError('ids must list every item of the same parent, and only those.')
+
+        now = timezone.now()
+        changed = []
+        for pk, order in zip(ids, plan_orders([items[pk].order for pk in ids], gap)):
+            item = items[pk]
+            if item.order != order:
+                item.order, item.updated_at = order, now
+                changed.append(item)
+        if changed:
+            # Bulk updates send no signals. Bump only once committed, so
+            # readers cannot cache the old order under the new version
+            model.objects.bulk_update(changed, ['order', 'updated_at'], batch_size=batch_size)
+            transaction.on_commit(bump_catalog_version)
+
+    return {pk: items[pk].order for pk in ids}, len(changed)
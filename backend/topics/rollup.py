@@ -0,0 +1,83 @@
+"""
+Subtree progress rollups for the Topic hierarchy.
+
+A topic's progress covers the contents of the topic itself and of every
+topic below it. Subtrees are matched through the materialized
+``Topic.path`` prefix, so the counts for any number of topics are computed
+with a single query per request. A path prefix given by another column
+cannot be searched in the path index, so the subtree totals are read from
+the maintained ``Topic.total_items`` when it covers the subtree, and
+completions are found from the user's own progress rows.
+"""
+from django.db.models import F, Func, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Topic, Content, include_subtree_totals
+
+
+def percentage(completed, total):
+    """
+    Convert a completed/total pair into an integer percentage
+    """
+    if total == 0:
+        return 0
+    return int((completed / total) * 100)
+
+
+def _count(queryset):
+    """
+    Wrap a queryset as a correlated COUNT subquery
+    """
+    counted = queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def with_subtree_progress(queryset, user):
+    """
+    Annotate a Topic queryset with subtree_total and subtree_completed
+    """
+    from progress.models import Progress
+
+    if include_subtree_totals():
+        subtree_total = F('total_items')
+    else:
+        subtree_total = _count(Content.objects.filter(topic__path__startswith=OuterRef('path')))
+    return queryset.annotate(
+        subtree_total=subtree_total,
+        subtree_completed=_count(Progress.objects.filter(
+            user=user,
+            completed=True,
+            content__topic__path__startswith=OuterRef('path'),
+        )),
+    )
+
+
+def subtree_progress(topic_ids, user):
+    """
+    Return {topic_id: (completed, total)} summed over each topic's subtree.
+
+    Topics without any content in their subtree map to (0, 0).
+    """
+    topic_ids = list(topic_ids)
+    if not topic_ids:
+        return {}
+    rows = with_subtree_progress(Topic.objects.filter(pk__in=topic_ids).order_by(), user).values_list(
+        'pk', 'subtree_completed', 'subtree_total'
+    )
+    rollup = {topic_id: (0, 0) for topic_id in topic_ids}
+    for topic_id, completed, total in rows:
+        rollup[topic_id] = (completed, total)
+    return rollup
+
+
+async def asubtree_progress(topic_ids, user):
+    topic_ids = list(topic_ids)
+    if not topic_ids:
+        return {}
+    rows = with_subtree_progress(Topic.objects.filter(pk__in=topic_ids).order_by(), user).values_list(
+        'pk', 'subtree_completed', 'subtree_total'
+    )
+    rollup = {topic_id: (0, 0) for topic_id in topic_ids}
+    async for topic_id, completed, total in rows:
+        rollup[topic_id] = (completed, total)
+    return rollup
@@ -1,7 +1,12 @@
 from rest_framework import serializers
+from takeyouforward.middleware import TimedSerializerMixin
 from .models import Topic, Content
 
-class ContentSerializer(serializers.ModelSerializer):
+# These serializers only produce the user-independent catalog, which the
+# views cache per catalog version. Per-user progress is overlaid by the
+# views at response time.
+
+class ContentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Content model
     """
@@ -9,7 +14,7 @@ class ContentSerializer(serializers.ModelSerializer):
         model = Content
         fields = ['id', 'title', 'content_type', 'url', 'description', 'order']
 
-class SubtopicSerializer(serializers.ModelSerializer):
+class SubtopicSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for subtopics
     """
@@ -17,40 +22,36 @@ class SubtopicSerializer(serializers.ModelSerializer):
         model = Topic
         fields = ['id', 'title', 'description', 'order', 'total_items']
 
-class TopicSerializer(serializers.ModelSerializer):
+class TopicSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Topic model
     """
     subtopics = SubtopicSerializer(many=True, read_only=True)
     contents = ContentSerializer(many=True, read_only=True)
-    progress = serializers.SerializerMethodField()
+    ancestors = serializers.SerializerMethodField()
     
     class Meta:
         model = Topic
-        fields = ['id', 'title', 'description', 'order', 'subtopics', 'contents', 'total_items', 'progress']
+        fields = ['id', 'title', 'description', 'order', 'ancestors', 'subtopics', 'contents', 'total_items']
     
-    def get_progress(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.get_progress_percentage(user)
-        return 0
+    def get_ancestors(self, obj):
+        # Breadcrumbs come from the materialized path in a single lookup
+        if not obj.get_ancestor_ids():
+            return []
+        return list(obj.get_ancestors().values('id', 'title'))
 
-class TopicListSerializer(serializers.ModelSerializer):
+class TopicListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Simplified serializer for listing topics
     """
     subtopics_count = serializers.SerializerMethodField()
-    progress = serializers.SerializerMethodField()
     
     class Meta:
         model = Topic
-        fields = ['id', 'title', 'description', 'total_items', 'subtopics_count', 'progress']
+        fields = ['id', 'title', 'description', 'total_items', 'subtopics_count']
     
     def get_subtopics_count(self, obj):
+        # Use the count annotated by TopicListView when it is available
+        if hasattr(obj, 'subtopics_count'):
+            return obj.subtopics_count
         return obj.subtopics.count()
-    
-    def get_progress(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.get_progress_percentage(user)
-        return 0
@@ -0,0 +1,41 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version, invalidate_catalog_size
+from .models import Topic, Content
+
+@receiver(pre_save, sender=Content)
+def content_saving(sender, instance, **kwargs):
+    # Remember the stored topic so a move can be detected after the save
+    instance._previous_topic_id = None
+    if not instance._state.adding:
+        instance._previous_topic_id = Content.objects.filter(pk=instance.pk).values_list('topic_id', flat=True).first()
+
+@receiver(post_save, sender=Content)
+def content_saved(sender, instance, created, raw=False, **kwargs):
+    if created:
+        invalidate_catalog_size()
+    if raw:
+        return
+    if created:
+        Topic.adjust_total_items(instance.topic_id, 1)
+    elif instance._previous_topic_id not in (None, instance.topic_id):
+        Topic.adjust_total_items(instance._previous_topic_id, -1)
+        Topic.adjust_total_items(instance.topic_id, 1)
+
+@receiver(post_delete, sender=Content)
+def content_deleted(sender, instance, **kwargs):
+    invalidate_catalog_size()
+    Topic.adjust_total_items(instance.topic_id, -1)
+
+@receiver(post_save, sender=Topic)
+@receiver(post_delete, sender=Topic)
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def catalog_changed(sender, **kwargs):
+    # Bump right away for readers inside this transaction, and again once
+    # the write is visible so no concurrent request can cache the old
+    # catalog under the new version
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
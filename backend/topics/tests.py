@@ -1,3 +1,710 @@
-from django.test import TestCase
+import time
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from progress.models import Progress
+from takeyouforward.middleware import RequestMetrics, RequestMetricsMiddleware, fingerprint
+from takeyouforward.queryplan import QueryPlanAssertions, analyze
+from .catalog import get_catalog_version
+from .models import Topic, Content
+from .importer import CatalogImportError, import_catalog, parse_csv, parse_tree
+from .ordering import ReorderError, plan_orders, reorder
+from .rollup import subtree_progress, with_subtree_progress
+from .views import AsyncContentListView, AsyncTopicDetailView, AsyncTopicListView
+
+User = get_user_model()
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+class TopicAPITestCase(APITestCase):
+    """
+    Shared fixtures for the topic endpoint tests
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='learner', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+
+    def create_topic(self, index, contents=2, subtopics=1, parent=None):
+        topic = Topic.objects.create(title=f"Topic {index}", order=index, parent=parent)
+        for i in range(subtopics):
+            Topic.objects.create(title=f"Subtopic {index}.{i}", order=i, parent=topic)
+        for i in range(contents):
+            Content.objects.create(
+                topic=topic,
+                title=f"Content {index}.{i}",
+                content_type='video',
+                url='https://example.com/video',
+                order=i
+            )
+        return topic
+
+    def complete(self, contents, user=None):
+        for content in contents:
+            Progress.objects.create(user=user or self.user, content=content, completed=True)
+
+class TopicListViewTests(TopicAPITestCase):
+    """
+    Tests for the topic list endpoint
+    """
+    def test_progress_and_subtopic_counts(self):
+        topic = self.create_topic(1, contents=4, subtopics=2)
+        self.complete(topic.contents.all()[:2])
+        other = User.objects.create_user(username='other', password='pass12345')
+        Progress.objects.create(user=other, content=topic.contents.last(), completed=True)
+
+        response = self.client.get(reverse('topic-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['subtopics_count'], 2)
+        self.assertEqual(response.data[0]['progress'], 50)
+
+    def test_query_count_does_not_grow_with_topics(self):
+        for index in range(3):
+            self.create_topic(index)
+        # Catalog states, user progress state, topics and rollup
+        with self.assertNumQueries(5):
+            self.client.get(reverse('topic-list'))
+
+        for index in range(3, 30):
+            self.create_topic(index)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('topic-list'))
+        self.assertEqual(len(response.data), 30)
+
+    def test_progress_includes_subtopic_contents(self):
+        root = self.create_topic(1, contents=0, subtopics=0)
+        child = self.create_topic(2, contents=2, subtopics=0, parent=root)
+        grandchild = self.create_topic(3, contents=2, subtopics=0, parent=child)
+        self.complete(grandchild.contents.all())
+
+        response = self.client.get(reverse('topic-list'))
+
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['progress'], 50)
+
+class SubtreeProgressTests(TopicAPITestCase):
+    """
+    Tests for the subtree progress rollup
+    """
+    def test_rollup_sums_nested_topics(self):
+        root = self.create_topic(1, contents=1, subtopics=0)
+        child = self.create_topic(2, contents=2, subtopics=0, parent=root)
+        grandchild = self.create_topic(3, contents=3, subtopics=0, parent=child)
+        empty = self.create_topic(4, contents=0, subtopics=0)
+        self.complete(child.contents.all()[:1])
+        self.complete(grandchild.contents.all())
+        Progress.objects.create(user=self.user, content=root.contents.first(), completed=False)
+
+        topic_ids = [root.pk, child.pk, grandchild.pk, empty.pk]
+        with self.assertNumQueries(1):
+            rollup = subtree_progress(topic_ids, self.user)
+
+        self.assertEqual(rollup, {
+            root.pk: (4, 6),
+            child.pk: (4, 5),
+            grandchild.pk: (3, 3),
+            empty.pk: (0, 0),
+        })
+        self.assertEqual(root.get_progress_percentage(self.user), 66)
+
+class TopicDetailViewTests(TopicAPITestCase):
+    """
+    Tests for the topic detail endpoint
+    """
+    def test_contents_carry_completed_flags(self):
+        topic = self.create_topic(1, contents=3, subtopics=0)
+        first, second, third = topic.contents.all()
+        self.complete([first])
+        Progress.objects.create(user=self.user, content=second, completed=False)
+
+        response = self.client.get(reverse('topic-detail', args=[topic.pk]))
+
+        self.assertEqual([content['completed'] for content in response.data['contents']], [True, False, False])
+
+    def test_query_budget_is_fixed(self):
+        root = self.create_topic(0, contents=0, subtopics=0)
+        small = self.create_topic(1, contents=1, subtopics=1, parent=root)
+        large = self.create_topic(2, contents=25, subtopics=10, parent=root)
+        self.complete(large.contents.all()[:5])
+
+        # Topic path, catalog states, progress state, topic, subtopics,
+        # contents, ancestors, rollup and completed flags
+        for topic in (small, large):
+            cache.clear()
+            with self.assertNumQueries(10):
+                self.client.get(reverse('topic-detail', args=[topic.pk]))
+
+    def test_subtopics_report_their_own_progress(self):
+        root = self.create_topic(1, contents=2, subtopics=0)
+        child = self.create_topic(2, contents=2, subtopics=0, parent=root)
+        self.complete(child.contents.all())
+
+        response = self.client.get(reverse('topic-detail', args=[root.pk]))
+
+        self.assertEqual(response.data['progress'], 50)
+        self.assertEqual(response.data['subtopics'][0]['progress'], 100)
+
+class TopicPathTests(TopicAPITestCase):
+    """
+    Tests for the materialized path index of the topic tree
+    """
+    def test_paths_follow_creates_and_moves(self):
+        root = Topic.objects.create(title="Root")
+        child = Topic.objects.create(title="Child", parent=root)
+        grandchild = Topic.objects.create(title="Grandchild", parent=child)
+        other = Topic.objects.create(title="Other")
+
+        self.assertEqual(root.path, f"{root.pk}/")
+        self.assertEqual(grandchild.path, f"{root.pk}/{child.pk}/{grandchild.pk}/")
+
+        child.parent = other
+        child.save()
+        grandchild.refresh_from_db()
+
+        self.assertEqual(grandchild.path, f"{other.pk}/{child.pk}/{grandchild.pk}/")
+        self.assertEqual(set(other.get_descendants()), {child, grandchild})
+        self.assertEqual(list(root.get_descendants()), [])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(grandchild.get_ancestors()), [other, child])
+
+    def test_detail_includes_ancestors(self):
+        root = self.create_topic(1, contents=0, subtopics=0)
+        child = self.create_topic(2, contents=0, subtopics=0, parent=root)
+
+        response = self.client.get(reverse('topic-detail', args=[child.pk]))
+
+        self.assertEqual(response.data['ancestors'], [{'id': root.pk, 'title': root.title}])
+
+class TotalItemsTests(TopicAPITestCase):
+    """
+    Tests for the denormalized Topic.total_items counter
+    """
+    @override_settings(TOPIC_TOTAL_ITEMS_INCLUDE_SUBTREE=False)
+    def test_direct_totals(self):
+        root = self.create_topic(1, contents=2, subtopics=0)
+        child = self.create_topic(2, contents=3, subtopics=0, parent=root)
+        root.refresh_from_db()
+        child.refresh_from_db()
+
+        self.assertEqual((root.total_items, child.total_items), (2, 3))
+
+    def test_recompute_command_repairs_drift(self):
+        root = self.create_topic(1, contents=2, subtopics=0)
+        child = self.create_topic(2, contents=3, subtopics=0, parent=root)
+        Topic.objects.update(total_items=0)
+
+        call_command('recompute_total_items', stdout=StringIO())
+
+        root.refresh_from_db()
+        child.refresh_from_db()
+        self.assertEqual((root.total_items, child.total_items), (5, 3))
+        with override_settings(TOPIC_TOTAL_ITEMS_INCLUDE_SUBTREE=False):
+            self.assertEqual(Topic.recompute_total_items(), 1)
+        root.refresh_from_db()
+        self.assertEqual(root.total_items, 2)
+
+    def test_saving_a_stale_instance_keeps_counters_and_paths(self):
+        root = self.create_topic(1, contents=0, subtopics=0)
+        other = self.create_topic(2, contents=0, subtopics=0)
+        stale = Topic.objects.get(pk=root.pk)
+        child = self.create_topic(3, contents=0, subtopics=0, parent=root)
+        Content.objects.create(topic=root, title='New', content_type='notes', url='https://example.com/notes')
+        Content.objects.create(topic=child, title='New', content_type='notes', url='https://example.com/notes')
+
+        stale.title = 'Renamed'
+        stale.save()
+        root.refresh_from_db()
+        self.assertEqual((root.title, root.total_items), ('Renamed', 2))
+
+        # Moving a stale instance still rewrites the stored subtree
+        stale_child = Topic.objects.get(pk=child.pk)
+        root.parent = other
+        root.save()
+        stale_child.title = 'Renamed child'
+        stale_child.save()
+        child.refresh_from_db()
+        self.assertEqual(child.path, f"{other.pk}/{root.pk}/{child.pk}/")
+
+@override_settings(CATALOG_CACHE=True)
+class CatalogCacheTests(TopicAPITestCase):
+    """
+    Tests for the versioned catalog response cache
+    """
+    def test_cached_catalog_with_per_user_progress(self):
+        topic = self.create_topic(1, contents=2, subtopics=1)
+        self.complete(topic.contents.all()[:1])
+        self.client.get(reverse('topic-list'))
+        self.client.get(reverse('topic-detail', args=[topic.pk]))
+
+        # Only the per-user progress state and rollup hit the database
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('topic-list'))
+        self.assertEqual(response.data[0]['progress'], 50)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('topic-detail', args=[topic.pk]))
+        self.assertEqual(response.data['progress'], 50)
+
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(reverse('topic-list'))
+        self.assertEqual(response.data[0]['progress'], 0)
+
+    def test_catalog_writes_invalidate_cache(self):
+        topic = self.create_topic(1, contents=1, subtopics=0)
+        self.assertEqual(len(self.client.get(reverse('content-list', args=[topic.pk])).data), 1)
+
+        Content.objects.create(topic=topic, title='New', content_type='notes', url='https://example.com/notes')
+        topic.title = 'Renamed'
+        topic.save()
+
+        self.assertEqual(len(self.client.get(reverse('content-list', args=[topic.pk])).data), 2)
+        self.assertEqual(self.client.get(reverse('topic-list')).data[0]['title'], 'Renamed')
+
+    @override_settings(CATALOG_CACHE=False)
+    def test_off_without_a_shared_cache(self):
+        topic = self.create_topic(1, contents=1, subtopics=0)
+        self.client.get(reverse('topic-list'))
+
+        # Another worker's edit, which this process's cache never sees
+        Topic.objects.filter(pk=topic.pk).update(title='Renamed')
+        self.assertEqual(self.client.get(reverse('topic-list')).data[0]['title'], 'Renamed')
+
+@override_settings(CATALOG_CACHE=True)
+class ConditionalGetTests(TopicAPITestCase):
+    """
+    Tests for ETag support on the catalog endpoints
+    """
+    def test_matching_etag_skips_the_response(self):
+        topic = self.create_topic(1)
+        url = reverse('topic-detail', args=[topic.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+        # The user's own progress is part of the response
+        self.complete(topic.contents.all()[:1])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_catalog_changes_change_the_etag(self):
+        topic = self.create_topic(1)
+        url = reverse('content-list', args=[topic.pk])
+        etag = self.client.get(url)['ETag']
+
+        topic.contents.first().delete()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    @override_settings(CATALOG_CACHE=False)
+    def test_states_cover_only_the_rows_served(self):
+        first, second = self.create_topic(1), self.create_topic(2)
+        url = reverse('content-list', args=[first.pk])
+        etag = self.client.get(url)['ETag']
+
+        second.contents.first().delete()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(CATALOG_CACHE=False)
+    def test_subtree_totals_and_ancestors_change_the_etag(self):
+        root = self.create_topic(1, contents=0, subtopics=0)
+        child = self.create_topic(2, contents=0, subtopics=0, parent=root)
+        leaf = self.create_topic(3, contents=0, subtopics=0, parent=child)
+        list_etag = self.client.get(reverse('topic-list'))['ETag']
+
+        # A content deep in the subtree changes the root's total_items
+        Content.objects.create(topic=leaf, title='Deep', content_type='notes', url='https://example.com/notes')
+        self.assertEqual(self.client.get(reverse('topic-list'), HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+        # Renaming an ancestor changes the breadcrumbs
+        url = reverse('topic-detail', args=[leaf.pk])
+        etag = self.client.get(url)['ETag']
+        root.title = 'Renamed'
+        root.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_cannot_miss_a_delete(self):
+        topic = self.create_topic(1)
+        url = reverse('content-list', args=[topic.pk])
+        self.assertNotIn('Last-Modified', self.client.get(url))
+
+        topic.contents.first().delete()
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+class CatalogImportTests(TestCase):
+    """
+    Tests for the bulk catalog import
+    """
+    def tree(self, contents=2):
+        return [{
+            'id': 'algebra',
+            'title': 'Algebra',
+            'subtopics': [{
+                'id': 'vectors',
+                'title': 'Vectors',
+                'contents': [
+                    {'id': f"vectors-{i}", 'title': f"Lesson {i}", 'content_type': 'video', 'url': 'https://example.com/v'}
+                    for i in range(contents)
+                ],
+            }],
+            'contents': [{'id': 'algebra-intro', 'title': 'Intro', 'content_type': 'notes', 'url': 'https://example.com/n'}],
+        }]
+
+    def test_creates_tree_with_paths_and_totals(self):
+        result = import_catalog(*parse_tree(self.tree()))
+
+        self.assertEqual(result, {'topics': {'created': 2, 'updated': 0}, 'contents': {'created': 3, 'updated': 0}})
+        algebra, vectors = Topic.objects.get(external_id='algebra'), Topic.objects.get(external_id='vectors')
+        self.assertEqual(vectors.parent, algebra)
+        self.assertEqual(vectors.path, f"{algebra.pk}/{vectors.pk}/")
+        self.assertEqual((algebra.total_items, vectors.total_items), (3, 2))
+        self.assertEqual(list(vectors.contents.values_list('order', flat=True)), [1, 2])
+
+    def test_reimport_updates_in_place(self):
+        import_catalog(*parse_tree(self.tree()))
+        tree = self.tree(contents=3)
+        tree[0]['subtopics'][0]['title'] = 'Vectors and spaces'
+
+        result = import_catalog(*parse_tree(tree))
+
+        self.assertEqual(result, {'topics': {'created': 0, 'updated': 2}, 'contents': {'created': 1, 'updated': 3}})
+        self.assertEqual(Topic.objects.count(), 2)
+        self.assertEqual(Topic.objects.get(external_id='vectors').title, 'Vectors and spaces')
+        self.assertEqual(Topic.objects.get(external_id='algebra').total_items, 4)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            import_catalog(*parse_tree(self.tree(contents=5)))
+        Topic.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            import_catalog(*parse_tree(self.tree(contents=100)))
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_rows_write_nothing(self):
+        tree = self.tree()
+        tree[0]['subtopics'][0]['contents'][0]['url'] = 'not a url'
+        tree[0]['parent'] = 'missing'
+
+        with self.assertRaises(CatalogImportError) as raised:
+            import_catalog(*parse_tree(tree))
+
+        self.assertEqual(
+            {error['error'] for error in raised.exception.errors}, {'url is not a valid URL.'}
+        )
+        tree[0]['subtopics'][0]['contents'][0]['url'] = 'https://example.com/v'
+        with self.assertRaises(CatalogImportError) as raised:
+            import_catalog(*parse_tree(tree))
+        self.assertEqual(raised.exception.errors[0]['error'], 'Unknown topic missing.')
+        self.assertFalse(Topic.objects.exists())
+
+    def test_children_that_are_not_lists_are_one_error(self):
+        tree = self.tree()
+        tree[0]['subtopics'] = 'vectors'
+        tree[0]['contents'] = {'id': 'algebra-intro'}
+
+        with self.assertRaises(CatalogImportError) as raised:
+            parse_tree(tree)
+
+        self.assertEqual(raised.exception.errors, [
+            {'at': '[0].subtopics', 'error': 'Expected a list.'},
+            {'at': '[0].contents', 'error': 'Expected a list.'},
+        ])
+
+    def test_rejects_urls_longer_than_the_column(self):
+        tree = self.tree()
+        tree[0]['contents'][0]['url'] = 'https://example.com/' + 'a' * 200
+
+        with self.assertRaises(CatalogImportError) as raised:
+            import_catalog(*parse_tree(tree))
+
+        self.assertEqual(raised.exception.errors[0]['error'], 'url is longer than 200 characters.')
+
+    def test_catalog_version_is_bumped_only_on_commit(self):
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            import_catalog(*parse_tree(self.tree()))
+        self.assertEqual(get_catalog_version(), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_catalog_version(), version)
+
+    def test_moves_take_unlisted_descendants_along(self):
+        import_catalog(*parse_tree(self.tree()))
+        vectors = Topic.objects.get(external_id='vectors')
+        leaf = Topic.objects.create(title='Leaf', parent=vectors)
+
+        import_catalog(*parse_csv("type,id,parent,title\ntopic,geometry,,Geometry\ntopic,vectors,geometry,Vectors\n"))
+
+        geometry = Topic.objects.get(external_id='geometry')
+        leaf.refresh_from_db()
+        self.assertEqual(leaf.path, f"{geometry.pk}/{vectors.pk}/{leaf.pk}/")
+        self.assertEqual(Topic.objects.get(pk=geometry.pk).total_items, 2)
+
+        # Nor can a topic move under its own subtopic
+        leaf.external_id = 'leaf'
+        leaf.save()
+        with self.assertRaises(CatalogImportError):
+            import_catalog(*parse_csv("type,id,parent,title\ntopic,vectors,leaf,Vectors\n"))
+        self.assertEqual(Topic.objects.get(pk=vectors.pk).parent_id, geometry.pk)
+
+    def test_csv_matches_tree(self):
+        rows = parse_csv(
+            "type,id,parent,title,content_type,url\n"
+            "topic,algebra,,Algebra,,\n"
+            "topic,vectors,algebra,Vectors,,\n"
+            "content,vectors-0,vectors,Lesson 0,video,https://example.com/v\n"
+            "content,vectors-1,vectors,Lesson 1,video,https://example.com/v\n"
+            "content,algebra-intro,algebra,Intro,notes,https://example.com/n\n"
+        )
+        key = lambda row: row['id']
+        tree = parse_tree(self.tree())
+        for parsed, expected in zip(rows, tree):
+            self.assertEqual(
+                [{k: v for k, v in row.items() if k != 'at'} for row in sorted(parsed, key=key)],
+                [{k: v for k, v in row.items() if k != 'at'} for row in sorted(expected, key=key)],
+            )
+
+class ReorderTests(TopicAPITestCase):
+    """
+    Tests for bulk reordering of sibling topics and contents
+    """
+    def test_plan_dense_orders(self):
+        self.assertEqual(plan_orders([3, 1, 2]), [1, 2, 3])
+
+    def test_plan_gap_orders_keeps_the_longest_increasing_run(self):
+        # Moving the last item to the front only renumbers that item
+        self.assertEqual(plan_orders([40, 10, 20, 30], gap=10), [5, 10, 20, 30])
+        self.assertEqual(plan_orders([20, 10, 30, 40], gap=10), [5, 10, 30, 40])
+        self.assertEqual(plan_orders([20, 30, 10], gap=10), [20, 30, 40])
+
+    def test_plan_gap_orders_renumbers_when_a_gap_is_used_up(self):
+        self.assertEqual(plan_orders([3, 1, 2], gap=10), [10, 20, 30])
+
+    def test_reorder_contents(self):
+        topic = self.create_topic(1, contents=4, subtopics=0)
+        ids = list(topic.contents.order_by('order').values_list('id', flat=True))
+        new_ids = ids[1:] + ids[:1]
+
+        with self.assertNumQueries(5):
+            orders, updated = reorder(Content, 'topic', new_ids, gap=0)
+        # Orders start at 0, so only the item moved to the end changes
+        self.assertEqual(updated, 1)
+        self.assertEqual(list(orders.values()), [1, 2, 3, 4])
+        self.assertEqual(list(topic.contents.order_by('order').values_list('id', flat=True)), new_ids)
+
+        # Nothing is written when the order does not change
+        self.assertEqual(reorder(Content, 'topic', new_ids, gap=0)[1], 0)
+
+    def test_gap_reorder_writes_only_moved_rows(self):
+        topic = self.create_topic(1, contents=0, subtopics=0)
+        contents = [
+            Content.objects.create(topic=topic, title=f"Content {i}", content_type='video', url='https://example.com/v', order=(i + 1) * 10)
+            for i in range(5)
+        ]
+        ids = [c.pk for c in contents]
+
+        orders, updated = reorder(Content, 'topic', ids[-1:] + ids[:-1], gap=10)
+        self.assertEqual(updated, 1)
+        self.assertEqual(orders[ids[-1]], 5)
+
+    def test_reorder_topics_under_a_parent(self):
+        parent = self.create_topic(1, contents=0, subtopics=3)
+        ids = list(parent.subtopics.order_by('order').values_list('id', flat=True))[::-1]
+        reorder(Topic, 'parent', ids, gap=0)
+        self.assertEqual(list(parent.subtopics.order_by('order').values_list('id', flat=True)), ids)
+
+    def test_rejects_anything_but_all_siblings(self):
+        first = self.create_topic(1, contents=2, subtopics=0)
+        second = self.create_topic(2, contents=1, subtopics=0)
+        ids = list(first.contents.values_list('id', flat=True))
+
+        for bad in ([], ids[:1], ids + ids[:1], ids + list(second.contents.values_list('id', flat=True)), [0]):
+            with self.assertRaises(ReorderError):
+                reorder(Content, 'topic', bad)
+
+    @override_settings(CATALOG_CACHE=True)
+    def test_invalidates_cached_catalog(self):
+        topic = self.create_topic(1, contents=2, subtopics=0)
+        etag = self.client.get(reverse('content-list', args=[topic.pk]))['ETag']
+        ids = list(topic.contents.order_by('order').values_list('id', flat=True))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            reorder(Content, 'topic', ids[::-1])
+        self.assertEqual(self.client.get(reverse('content-list', args=[topic.pk]))['ETag'], etag)
+        for callback in callbacks:
+            callback()
+
+        response = self.client.get(reverse('content-list', args=[topic.pk]))
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([c['id'] for c in response.data], ids[::-1])
+
+class AsyncReadViewTests(TopicAPITestCase):
+    """
+    Tests for the async variants of the catalog read views
+    """
+    def setUp(self):
+        super().setUp()
+        self.token = Token.objects.create(user=self.user)
+        self.topic = self.create_topic(1, contents=3, subtopics=2)
+        self.complete(self.topic.contents.all()[:1])
+
+    def call(self, view, headers=None, **kwargs):
+        headers = {'Authorization': f"Token {self.token.key}", **(headers or {})}
+        request = AsyncRequestFactory().get('/', headers=headers)
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def test_same_responses_as_the_sync_views(self):
+        for view, name, kwargs in [
+            (AsyncTopicListView, 'topic-list', {}),
+            (AsyncTopicDetailView, 'topic-detail', {'pk': self.topic.pk}),
+            (AsyncContentListView, 'content-list', {'topic_id': self.topic.pk}),
+        ]:
+            expected = self.client.get(reverse(name, kwargs=kwargs))
+            # Once built by the sync view and once by the async one
+            for _ in range(2):
+                response = self.call(view, **kwargs)
+                self.assertEqual(response.status_code, 200, name)
+                self.assertJSONEqual(response.content, expected.content.decode())
+                self.assertEqual(response['ETag'], expected['ETag'])
+                cache.clear()
+
+    def test_conditional_get(self):
+        etag = self.call(AsyncTopicDetailView, pk=self.topic.pk)['ETag']
+
+        response = self.call(AsyncTopicDetailView, {'If-None-Match': etag}, pk=self.topic.pk)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_errors_match_drf(self):
+        missing = self.call(AsyncTopicDetailView, pk=9999)
+        self.assertEqual(missing.status_code, 404)
+        self.assertJSONEqual(
+            missing.content, self.client.get(reverse('topic-detail', args=[9999])).content.decode()
+        )
+
+        response = self.call(AsyncTopicListView, {'Authorization': ''})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        self.assertEqual(self.call(AsyncTopicListView, {'Authorization': 'Token invalid'}).status_code, 401)
+
+class RequestMetricsTests(TopicAPITestCase):
+    """
+    Tests for the request instrumentation middleware
+    """
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+    def test_reports_queries_timings_and_size(self):
+        self.create_topic(1)
+        with self.assertLogs('takeyouforward.requests', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('topic-list'))
+
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        metrics = logs.records[0].metrics
+        self.assertGreater(metrics['serializer_ms'], 0)
+        self.assertEqual(metrics['queries'], len(queries))
+        self.assertEqual(metrics['response_bytes'], len(response.content))
+        self.assertEqual(metrics['duplicates'], [])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+    def test_async_requests(self):
+        def query_twice():
+            # Runs in another thread, on that thread's own connection
+            try:
+                with connections['default'].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.execute('SELECT 2')
+            finally:
+                connections['default'].close()
+
+        async def view(request):
+            await sync_to_async(query_twice, thread_sensitive=False)()
+            return HttpResponse('ok')
+        middleware = RequestMetricsMiddleware(view)
+
+        with self.assertLogs('takeyouforward.requests', 'INFO') as logs:
+            response = async_to_sync(middleware)(AsyncRequestFactory().get('/'))
+
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertEqual(logs.records[0].metrics['queries'], 2)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('topic-list')))
+
+    def test_flags_repeated_queries(self):
+        topics = [self.create_topic(i, contents=0, subtopics=0) for i in range(3)]
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics):
+            for topic in topics:
+                Topic.objects.get(pk=topic.pk)
+            list(Topic.objects.filter(pk__in=[topic.pk for topic in topics]))
+
+        duplicates = metrics.duplicates(threshold=3)
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0]['count'], 3)
+        self.assertEqual(
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s)'), fingerprint('SELECT 1 FROM t WHERE id IN (%s)')
+        )
+
+class QueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    Tests that the catalog read paths are served by indexes
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='learner', password='pass12345')
+        for i in range(10):
+            root = Topic.objects.create(title=f"Topic {i}", order=i)
+            for j in range(10):
+                Topic.objects.create(title=f"Subtopic {i}.{j}", order=j, parent=root)
+        Content.objects.bulk_create([
+            Content(topic=topic, title=f"Content {k}", content_type='video', url='https://example.com/video', order=k)
+            for topic in Topic.objects.all()
+            for k in range(20)
+        ])
+        Progress.objects.bulk_create([
+            Progress(user=cls.user, content_id=content_id, completed=content_id % 2 == 0)
+            for content_id in Content.objects.values_list('id', flat=True)
+        ])
+        cls.topic = Topic.objects.get(title='Topic 3')
+        analyze()
+
+    def test_topic_tree(self):
+        self.assertIndexed(Topic.objects.filter(parent=None).order_by('order'))
+        self.assertIndexed(Topic.objects.filter(parent=self.topic).order_by('order'))
+        if connection.vendor == 'postgresql':
+            # SQLite's case-insensitive LIKE cannot use the path index
+            self.assertIndexed(Topic.objects.filter(path__startswith=self.topic.path))
+
+    def test_topic_contents(self):
+        self.assertIndexed(Content.objects.filter(topic=self.topic).order_by('order'))
+
+    def test_subtree_rollup(self):
+        self.assertIndexed(with_subtree_progress(Topic.objects.filter(parent=None), self.user))
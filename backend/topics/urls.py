@@ -1,5 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from .views import TopicListView, TopicDetailView, ContentListView
+from .views import (
+    AsyncContentListView, AsyncTopicDetailView, AsyncTopicListView, ContentListView, TopicDetailView, TopicListView,
+)
+
+if settings.ASYNC_READ_VIEWS:
+    TopicListView, TopicDetailView, ContentListView = AsyncTopicListView, AsyncTopicDetailView, AsyncContentListView
 
 urlpatterns = [
     path('', TopicListView.as_view(), name='topic-list'),
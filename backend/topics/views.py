@@ -1,9 +1,74 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Prefetch
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions
 from rest_framework.response import Response
+from takeyouforward.async_views import AsyncAPIView
+from takeyouforward.conditional import AsyncConditionalGetMixin, ConditionalGetMixin, aqueryset_state, queryset_state
+from .catalog import (
+    aget_cached_catalog, aget_catalog_states, get_cached_catalog, get_catalog_states, topic_list_querysets, topic_querysets,
+)
 from .models import Topic, Content
+from .rollup import asubtree_progress, subtree_progress, percentage
 from .serializers import TopicSerializer, TopicListSerializer, ContentSerializer
 
-class TopicListView(generics.ListAPIView):
+def overlay_progress(items, rollup):
+    """
+    Merge the user's subtree progress into cached catalog entries
+    """
+    for item in items:
+        item['progress'] = percentage(*rollup.get(item['id'], (0, 0)))
+    return items
+
+def overlay_completed(contents, user):
+    """
+    Mark each cached content entry with the user's completed flag, reading
+    only the user's Progress rows for those contents
+    """
+    from progress.models import Progress
+    completed = set(Progress.objects.filter(
+        user=user,
+        completed=True,
+        content_id__in=[content['id'] for content in contents]
+    ).values_list('content_id', flat=True))
+    for content in contents:
+        content['completed'] = content['id'] in completed
+    return contents
+
+async def aoverlay_completed(contents, user):
+    from progress.models import Progress
+    completed = {content_id async for content_id in Progress.objects.filter(
+        user=user,
+        completed=True,
+        content_id__in=[content['id'] for content in contents]
+    ).values_list('content_id', flat=True)}
+    for content in contents:
+        content['completed'] = content['id'] in completed
+    return contents
+
+def progress_state(user):
+    from progress.models import Progress
+    return queryset_state(Progress.objects.filter(user=user))
+
+async def aprogress_state(user):
+    from progress.models import Progress
+    return await aqueryset_state(Progress.objects.filter(user=user))
+
+def topic_states(topic_id):
+    return get_catalog_states(f"topic:{topic_id}", lambda: topic_querysets(
+        topic_id, Topic.objects.filter(pk=topic_id).values_list('path', flat=True).first() or ''
+    ))
+
+async def atopic_states(topic_id):
+    async def querysets():
+        path = await Topic.objects.filter(pk=topic_id).values_list('path', flat=True).afirst()
+        return topic_querysets(topic_id, path or '')
+    return await aget_catalog_states(f"topic:{topic_id}", querysets)
+
+def contents_querysets(topic_id):
+    return [Content.objects.filter(topic_id=topic_id)]
+
+class TopicListView(ConditionalGetMixin, generics.ListAPIView):
     """
     View for listing main topics (no parent)
     """
@@ -11,17 +76,51 @@ class TopicListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Topic.objects.filter(parent=None)
+        return Topic.objects.filter(parent=None).annotate(subtopics_count=Count('subtopics'))
+
+    def get_conditional_states(self):
+        return [*get_catalog_states('topic-list', topic_list_querysets), progress_state(self.request.user)]
+
+    def list(self, request, *args, **kwargs):
+        topics = get_cached_catalog(
+            'topic-list',
+            lambda: self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data
+        )
+
+        # Progress for every listed subtree is rolled up in one query
+        rollup = subtree_progress([topic['id'] for topic in topics], request.user)
+        return Response(overlay_progress(topics, rollup))
 
-class TopicDetailView(generics.RetrieveAPIView):
+class TopicDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     View for retrieving a specific topic with its subtopics and contents
     """
-    queryset = Topic.objects.all()
+    queryset = Topic.objects.prefetch_related(
+        Prefetch('subtopics', queryset=Topic.objects.order_by('order')),
+        Prefetch('contents', queryset=Content.objects.order_by('order')),
+    )
     serializer_class = TopicSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class ContentListView(generics.ListAPIView):
+    def get_conditional_states(self):
+        return [*topic_states(self.kwargs['pk']), progress_state(self.request.user)]
+
+    def retrieve(self, request, *args, **kwargs):
+        topic = get_cached_catalog(
+            f"topic:{kwargs['pk']}",
+            lambda: self.get_serializer(self.get_object()).data
+        )
+
+        # Roll up the topic and each of its subtopics in a single query
+        topic_ids = [topic['id'], *(subtopic['id'] for subtopic in topic['subtopics'])]
+        rollup = subtree_progress(topic_ids, request.user)
+        overlay_progress(topic['subtopics'], rollup)
+        overlay_progress([topic], rollup)
+        if topic['contents']:
+            overlay_completed(topic['contents'], request.user)
+        return Response(topic)
+
+class ContentListView(ConditionalGetMixin, generics.ListAPIView):
     """
     View for listing contents of a specific topic
     """
@@ -31,3 +130,77 @@ class ContentListView(generics.ListAPIView):
     def get_queryset(self):
         topic_id = self.kwargs.get('topic_id')
         return Content.objects.filter(topic_id=topic_id)
+
+    def get_conditional_states(self):
+        topic_id = self.kwargs['topic_id']
+        return get_catalog_states(f"contents:{topic_id}", lambda: contents_querysets(topic_id))
+
+    def list(self, request, *args, **kwargs):
+        contents = get_cached_catalog(
+            f"contents:{kwargs['topic_id']}",
+            lambda: self.get_serializer(self.filter_queryset(self.get_queryset()), many=True).data
+        )
+        return Response(contents)
+
+# Async variants of the read views above, routed instead of them when the
+# app is served under ASGI (see settings.ASYNC_READ_VIEWS). They return the
+# same responses.
+
+class AsyncTopicListView(AsyncConditionalGetMixin, AsyncAPIView):
+    """
+    Async view for listing main topics (no parent)
+    """
+    async def get_conditional_states(self):
+        async def querysets():
+            return topic_list_querysets()
+        return [*await aget_catalog_states('topic-list', querysets), await aprogress_state(self.request.user)]
+
+    async def get_data(self, request, *args, **kwargs):
+        async def build():
+            queryset = Topic.objects.filter(parent=None).annotate(subtopics_count=Count('subtopics'))
+            return TopicListSerializer([topic async for topic in queryset], many=True).data
+
+        topics = await aget_cached_catalog('topic-list', build)
+        rollup = await asubtree_progress([topic['id'] for topic in topics], request.user)
+        return overlay_progress(topics, rollup)
+
+class AsyncTopicDetailView(AsyncConditionalGetMixin, AsyncAPIView):
+    """
+    Async view for retrieving a specific topic with its subtopics and contents
+    """
+    async def get_conditional_states(self):
+        return [*await atopic_states(self.kwargs['pk']), await aprogress_state(self.request.user)]
+
+    async def get_data(self, request, *args, **kwargs):
+        # Serializing a topic looks up its ancestors, so a cache miss is
+        # built synchronously
+        topic = await aget_cached_catalog(
+            f"topic:{kwargs['pk']}",
+            sync_to_async(lambda: TopicSerializer(get_object_or_404(TopicDetailView.queryset, pk=kwargs['pk'])).data)
+        )
+
+        topic_ids = [topic['id'], *(subtopic['id'] for subtopic in topic['subtopics'])]
+        rollup = await asubtree_progress(topic_ids, request.user)
+        overlay_progress(topic['subtopics'], rollup)
+        overlay_progress([topic], rollup)
+        if topic['contents']:
+            await aoverlay_completed(topic['contents'], request.user)
+        return topic
+
+class AsyncContentListView(AsyncConditionalGetMixin, AsyncAPIView):
+    """
+    Async view for listing contents of a specific topic
+    """
+    async def get_conditional_states(self):
+        topic_id = self.kwargs['topic_id']
+
+        async def querysets():
+            return contents_querysets(topic_id)
+        return await aget_catalog_states(f"contents:{topic_id}", querysets)
+
+    async def get_data(self, request, *args, **kwargs):
+        async def build():
+            queryset = Content.objects.filter(topic_id=kwargs['topic_id'])
+            return ContentSerializer([content async for content in queryset], many=True).data
+
+        return await aget_cached_catalog(f"contents:{kwargs['topic_id']}", build)
@@ -0,0 +1,117 @@
+"""
+Token authentication without a database query per request.
+
+DRF's TokenAuthentication loads the token and its user on every call.
+CachedTokenAuthentication keeps recently used tokens in a bounded,
+in-process LRU cache whose entries expire after AUTH_TOKEN_CACHE_TTL
+seconds. users.signals drops the entries of a token when it is deleted,
+as ChangePasswordView does when it rotates the token. It also drops all
+of a user's entries when the user is saved, which covers deactivation,
+or deleted, except for the last_login-only save of every login.
+
+Only the process that handled the change drops its entries. Other
+processes keep authenticating a rotated token or a deactivated user
+until their entries expire, i.e. for up to AUTH_TOKEN_CACHE_TTL seconds.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+class LRUCache:
+    """
+    Thread-safe mapping with a maximum size and a per-entry time to live.
+
+    When given, `group(value)` files each entry under a group key, so
+    delete_group() drops a group's entries without scanning the cache.
+    """
+    def __init__(self, max_size, ttl, group=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.group = group
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            group = self.group(value) if self.group else None
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def delete_group(self, group):
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        group = self.group(entry[1]) if entry is not None and self.group else None
+        if group is not None:
+            keys = self._groups[group]
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Entries are (user, token) pairs, grouped by user id
+token_cache = LRUCache(
+    settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL, group=lambda entry: entry[0].pk if entry else None
+)
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+
+
+def invalidate_user(user_id):
+    token_cache.delete_group(user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication served from token_cache when possible
+    """
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            entry = super().authenticate_credentials(key)
+            token_cache.set(key, entry)
+        user, token = entry
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        # Each request gets its own copy, views may modify request.user
+        return copy.copy(user), token
@@ -0,0 +1,177 @@
+"""
+Credential checking shared by the user and admin login views.
+
+A login attempt costs at most one password hash. The account is found
+by username or email in a single indexed query. An unknown account
+still pays one hash, so response times do not reveal which accounts
+exist.
+
+Failed attempts are counted per client IP and per account in windows
+of time buckets kept in the cache. The IP comes from REMOTE_ADDR unless
+REST_FRAMEWORK['NUM_PROXIES'] trusts X-Forwarded-For, and the account is
+the resolved user, so its username and email share one window. Each
+attempt is counted with an atomic increment before the password is
+checked, and taken back if it succeeds, so parallel attempts see each
+other. Once a limit is reached, attempts are rejected before any hashing
+(and before the lookup for the IP limit), so a credential-stuffing burst
+cannot keep every worker busy hashing. The
+limits only hold across workers with a shared cache backend; under
+locmem each worker counts on its own.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+User = get_user_model()
+
+
+class LoginError(Exception):
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    def response(self):
+        headers = {'Retry-After': str(self.retry_after)} if self.retry_after else None
+        return Response({'error': str(self)}, status=self.status_code, headers=headers)
+
+
+class FailedLoginWindow:
+    """
+    Failed login counts for one key, in time buckets covering the window
+    """
+    buckets = 10
+
+    def __init__(self, scope, ident, limit):
+        self.prefix = f"users:login-failures:{scope}:{hashlib.sha256(ident.encode()).hexdigest()}"
+        self.limit = limit
+        self.window = settings.LOGIN_FAILURE_WINDOW
+        self.bucket_size = max(1, math.ceil(self.window / self.buckets))
+
+    def _key(self, bucket):
+        return f"{self.prefix}:{bucket}"
+
+    def counts(self, now):
+        """
+        Return {bucket: failures} for the buckets overlapping the window
+        """
+        buckets = range(int((now - self.window) // self.bucket_size), int(now // self.bucket_size) + 1)
+        counts = cache.get_many([self._key(bucket) for bucket in buckets])
+        return {bucket: counts[self._key(bucket)] for bucket in buckets if counts.get(self._key(bucket))}
+
+    def retry_after(self, now):
+        """
+        Seconds until another attempt is allowed, or 0 if it is now
+        """
+        counts = self.counts(now)
+        total = sum(counts.values())
+        if total < self.limit:
+            return 0
+        for bucket in sorted(counts):
+            total -= counts[bucket]
+            if total < self.limit:
+                # Once this bucket has left the window
+                return max(1, math.ceil((bucket + 1) * self.bucket_size + self.window - now))
+        return self.window
+
+    def add(self, now):
+        """
+        Count an attempt and return the failures in the window including it
+        """
+        key = self._key(int(now // self.bucket_size))
+        cache.add(key, 0, self.window + self.bucket_size)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between the add and the increment
+            cache.set(key, 1, self.window + self.bucket_size)
+        return sum(self.counts(now).values())
+
+    def remove(self, now):
+        """
+        Take back an attempt counted by add()
+        """
+        try:
+            cache.decr(self._key(int(now // self.bucket_size)))
+        except ValueError:
+            pass
+
+    def reset(self, now):
+        buckets = range(int((now - self.window) // self.bucket_size), int(now // self.bucket_size) + 1)
+        cache.delete_many([self._key(bucket) for bucket in buckets])
+
+
+def ip_window(request):
+    return FailedLoginWindow('ip', BaseThrottle().get_ident(request), settings.LOGIN_FAILURE_IP_LIMIT)
+
+
+def account_window(user, identifier):
+    """
+    Return the failure window of the account, keyed on the user so that
+    its username and email count together
+    """
+    ident = f"user:{user.pk}" if user is not None else f"missing:{identifier.strip().lower()}"
+    return FailedLoginWindow('account', ident, settings.LOGIN_FAILURE_ACCOUNT_LIMIT)
+
+
+def resolve_user(identifier):
+    """
+    Return the user whose username or email is `identifier`, preferring a
+    username match, in one query
+    """
+    matches = list(User.objects.filter(Q(username=identifier) | Q(email=identifier))[:2])
+    for user in matches:
+        if user.username == identifier:
+            return user
+    return matches[0] if matches else None
+
+
+def authenticate_login(request, identifier, password, create_missing=None):
+    """
+    Return the active user matching the credentials, or raise LoginError.
+
+    `create_missing(identifier, password)` may create and return a user
+    when no account matches.
+    """
+    now = time.time()
+    ip = ip_window(request)
+    retry_after = ip.retry_after(now)
+    if not retry_after:
+        user = resolve_user(identifier)
+        windows = [ip, account_window(user, identifier)]
+        retry_after = windows[1].retry_after(now)
+    if not retry_after:
+        # Counted as failed up front, so parallel attempts see each other
+        if any([window.add(now) > window.limit for window in windows]):
+            for window in windows:
+                window.remove(now)
+            retry_after = max(window.retry_after(now) for window in windows) or 1
+    if retry_after:
+        raise LoginError('Too many failed login attempts, try again later', status.HTTP_429_TOO_MANY_REQUESTS, retry_after)
+
+    if user is None and create_missing is not None:
+        user = create_missing(identifier, password)
+        if user is not None:
+            windows[0].remove(now)
+            windows[1].reset(now)
+            return user
+
+    if user is None:
+        # Hash anyway, so unknown accounts take as long as known ones
+        User().set_password(password)
+    elif user.check_password(password) and user.is_active:
+        windows[0].remove(now)
+        windows[1].reset(now)
+        return user
+
+    user_login_failed.send(sender=__name__, credentials={'username': identifier}, request=request)
+    raise LoginError('Invalid credentials', status.HTTP_401_UNAUTHORIZED)
@@ -12,6 +12,48 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            # Keyset pagination of the admin user list
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+            # Active user counts
+            models.Index(fields=['last_login'], name='user_last_login_idx'),
+            # Login by email
+            models.Index(fields=['email'], name='user_email_idx'),
+        ]
 
     def __str__(self):
         return self.username
+
+class TokenUser(User):
+    """
+    User built from the claims of a signed access token (see users.tokens).
+    The fields that are not claimed are deferred and load together on the
+    first access to any of them.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using, fields, from_queryset)
+
+class RefreshToken(models.Model):
+    """
+    Refresh token for the signed access tokens (see users.tokens).
+
+    Only a hash of the token is stored. Each refresh marks the token used
+    and issues a new one in the same family; presenting a used token again
+    revokes the whole family.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='refresh_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    family = models.CharField(max_length=32, db_index=True)
+    expires_at = models.DateTimeField()
+    used_at = models.DateTimeField(null=True, blank=True)
+    revoked = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.family}"
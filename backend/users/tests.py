@@ -1,3 +1,263 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .authentication import token_cache
+from .login import account_window, resolve_user
+
+User = get_user_model()
+
+class CountingHasher(MD5PasswordHasher):
+    """
+    Fast hasher that counts how many hashes are computed
+    """
+    calls = 0
+
+    def encode(self, password, salt):
+        CountingHasher.calls += 1
+        return super().encode(password, salt)
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+class CachedTokenAuthenticationTests(APITestCase):
+    """
+    Tests for the cached token authentication
+    """
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='learner', password='pass12345')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_repeat_requests_skip_the_token_query(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('profile'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['username'], 'learner')
+
+    def test_profile_changes_are_visible(self):
+        self.client.get(reverse('profile'))
+        self.client.patch(reverse('profile'), {'bio': 'Hello'}, format='json')
+
+        self.assertEqual(self.client.get(reverse('profile')).data['bio'], 'Hello')
+
+    def test_password_change_revokes_the_old_token(self):
+        self.client.get(reverse('profile'))
+        response = self.client.put(reverse('change-password'), {
+            'old_password': 'pass12345', 'new_password': 'n3w-pass-phrase', 'new_password2': 'n3w-pass-phrase',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+    def test_deactivation_revokes_access(self):
+        self.client.get(reverse('profile'))
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    def test_user_changes_only_drop_that_users_entries(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        other_token = Token.objects.create(user=other)
+        self.client.get(reverse('profile'))
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {other_token.key}")
+        self.client.get(reverse('profile'))
+
+        # Logins only save last_login, which keeps the cached entries
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+        self.user.save()
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(other_token.key))
+
+    def test_cache_is_bounded(self):
+        for i in range(token_cache.max_size + 5):
+            token_cache.set(str(i), None)
+        self.assertEqual(len(token_cache), token_cache.max_size)
+        self.assertIsNone(token_cache.get('0'))
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=0, SIGNED_ACCESS_TOKENS=True)
+class SignedTokenTests(APITestCase):
+    """
+    Tests for the signed access tokens and refresh token rotation
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='learner', email='learner@example.com', password='pass12345')
+        response = self.client.post(reverse('login'), {'username': 'learner', 'password': 'pass12345'}, format='json')
+        self.tokens = response.data
+
+    def bearer(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def refresh(self, refresh):
+        return self.client.post(reverse('token-refresh'), {'refresh': refresh}, format='json')
+
+    def test_access_token_authenticates_without_auth_queries(self):
+        self.bearer(self.tokens['access'])
+        self.client.get(reverse('overall-progress'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('overall-progress'))
+        self.assertEqual(response.status_code, 200)
+
+        # Unclaimed fields load together on first use
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['email'], 'learner@example.com')
+
+    def test_rejects_tampered_and_expired_tokens(self):
+        self.bearer(self.tokens['access'][:-2] + 'xx')
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+        self.bearer(self.tokens['access'])
+        with override_settings(ACCESS_TOKEN_LIFETIME=-1):
+            self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    def test_refresh_rotates_and_detects_reuse(self):
+        rotated = self.refresh(self.tokens['refresh'])
+        self.assertEqual(rotated.status_code, 200)
+        self.assertNotEqual(rotated.data['refresh'], self.tokens['refresh'])
+
+        # Replaying the old token revokes the whole family
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(rotated.data['refresh']).status_code, 401)
+
+    def test_logout_revokes_refresh_and_access_token(self):
+        self.bearer(self.tokens['access'])
+        response = self.client.post(reverse('token-revoke'), {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+    def test_password_change_revokes_earlier_tokens(self):
+        self.bearer(self.tokens['access'])
+        response = self.client.put(reverse('change-password'), {
+            'old_password': 'pass12345', 'new_password': 'n3w-pass-phrase', 'new_password2': 'n3w-pass-phrase',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+        self.bearer(response.data['access'])
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+    def test_revocations_do_not_overwrite_each_other(self):
+        other = self.client.post(reverse('login'), {'username': 'learner', 'password': 'pass12345'}, format='json').data
+        for tokens in (self.tokens, other):
+            self.bearer(tokens['access'])
+            self.client.post(reverse('token-revoke'), {'refresh': tokens['refresh']}, format='json')
+
+        for tokens in (self.tokens, other):
+            self.bearer(tokens['access'])
+            self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+
+    @override_settings(SIGNED_ACCESS_TOKENS=False)
+    def test_login_only_issues_signed_tokens_when_enabled(self):
+        response = self.client.post(reverse('login'), {'username': 'learner', 'password': 'pass12345'}, format='json')
+        self.assertIn('token', response.data)
+        self.assertNotIn('access', response.data)
+
+    def test_deactivation_revokes_tokens(self):
+        self.user.is_active = False
+        self.user.save()
+
+        self.bearer(self.tokens['access'])
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 401)
+        self.assertEqual(self.refresh(self.tokens['refresh']).status_code, 401)
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=0, PASSWORD_HASHERS=['users.tests.CountingHasher'])
+class LoginPipelineTests(APITestCase):
+    """
+    Tests for the shared login pipeline and its failed-attempt limits
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='learner', email='learner@example.com', password='pass12345')
+        self.staff = User.objects.create_user(username='staff', email='staff@example.com', password='pass12345', is_staff=True)
+        CountingHasher.calls = 0
+
+    def login(self, username, password='pass12345', url='login', ip='10.0.0.1'):
+        return self.client.post(reverse(url), {'username': username, 'password': password}, format='json',
+                                REMOTE_ADDR=ip)
+
+    def test_username_or_email_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_user('learner@example.com'), self.user)
+        self.assertEqual(self.login('learner@example.com').status_code, 200)
+        self.assertEqual(self.login('staff', url='admin-login').status_code, 200)
+
+    def test_each_attempt_hashes_at_most_once(self):
+        for username in ('learner', 'nobody', 'staff@example.com'):
+            CountingHasher.calls = 0
+            self.login(username, 'wrong-password', url='admin-login')
+            self.assertEqual(CountingHasher.calls, 1, username)
+
+    def test_account_limit_rejects_before_hashing(self):
+        for i in range(5):
+            self.assertEqual(self.login('learner', 'wrong-password', ip=f"10.0.1.{i}").status_code, 401)
+
+        CountingHasher.calls = 0
+        response = self.login('learner')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(CountingHasher.calls, 0)
+        # Other accounts are unaffected
+        self.assertEqual(self.login('staff').status_code, 200)
+
+    def test_ip_limit_spans_accounts(self):
+        for i in range(20):
+            self.login(f"user{i}", 'wrong-password')
+
+        self.assertEqual(self.login('learner').status_code, 429)
+        self.assertEqual(self.login('learner', ip='10.0.0.2').status_code, 200)
+
+    def test_forwarded_for_does_not_split_the_ip_limit(self):
+        for i in range(20):
+            self.client.post(reverse('login'), {'username': f"user{i}", 'password': 'wrong-password'},
+                             format='json', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f"192.0.2.{i}")
+
+        response = self.client.post(reverse('login'), {'username': 'learner', 'password': 'pass12345'},
+                                    format='json', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.0.2.99')
+        self.assertEqual(response.status_code, 429)
+
+    def test_username_and_email_share_the_account_limit(self):
+        for i in range(5):
+            identifier = 'learner' if i % 2 else 'learner@example.com'
+            self.assertEqual(self.login(identifier, 'wrong-password', ip=f"10.0.1.{i}").status_code, 401)
+
+        self.assertEqual(self.login('learner@example.com').status_code, 429)
+        self.assertEqual(self.login('learner').status_code, 429)
+
+    def test_parallel_attempts_cannot_pass_the_limit(self):
+        # Attempts are counted before their password is checked, so ones
+        # still in flight already take up the limit
+        now = time.time()
+        window = account_window(self.user, 'learner')
+        self.assertEqual([window.add(now) for _ in range(6)], [1, 2, 3, 4, 5, 6])
+        window.remove(now)
+        self.assertEqual(self.login('learner').status_code, 429)
+        self.assertGreater(window.retry_after(now), 0)
+
+        window.reset(now)
+        self.assertEqual(self.login('learner').status_code, 200)
+
+    def test_admin_bootstrap_only_creates_missing_users_in_debug(self):
+        self.assertEqual(self.login('admin', url='admin-login').status_code, 401)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.login('admin', url='admin-login').status_code, 200)
+            # An existing account never has its password reset
+            self.assertEqual(self.login('admin', 'other-password', url='admin-login').status_code, 401)
+        self.assertTrue(User.objects.get(username='admin').is_superuser)
@@ -0,0 +1,192 @@
+"""
+Signed, short-lived access tokens with rotating refresh tokens.
+
+An access token is a signed claim of the user's id, username and staff
+flag. It is checked with the SECRET_KEY alone, so requests that carry
+one (`Authorization: Bearer <token>`) never touch the auth tables. It
+expires after ACCESS_TOKEN_LIFETIME seconds.
+
+A refresh token is an opaque random string stored in RefreshToken by
+hash. Exchanging it marks it used and issues a new access and refresh
+pair of the same family. If a used token is presented again, it has
+leaked, so its whole family is revoked.
+
+Revocations are kept in the cache until the tokens they match would
+have expired anyway: one key per revoked token and one "not before"
+time per user, so concurrent revocations never overwrite each other.
+Each check is one get_many. They only reach every worker with a shared
+cache backend (CACHE_BACKEND=redis); under the per-process locmem
+default, other workers accept a revoked access token until it expires,
+which is why signed tokens are off by default.
+"""
+import hashlib
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import RefreshToken, TokenUser
+
+ACCESS_SALT = 'users.tokens.access'
+REVOKED_TOKEN_KEY = 'users:revoked-token:{}'
+NOT_BEFORE_KEY = 'users:tokens-not-before:{}'
+
+
+class TokenError(Exception):
+    pass
+
+
+def _now_ns():
+    # Nanoseconds, so a token issued right after a revocation is not
+    # mistaken for one issued before it
+    return time.time_ns()
+
+
+def _hash(raw):
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class RevocationList:
+    """
+    Revoked access tokens and per-user "not before" times in the cache
+    """
+    def revoke_token(self, token_id):
+        cache.set(REVOKED_TOKEN_KEY.format(token_id), True, settings.ACCESS_TOKEN_LIFETIME)
+
+    def revoke_user(self, user_id):
+        cache.set(NOT_BEFORE_KEY.format(user_id), _now_ns(), settings.ACCESS_TOKEN_LIFETIME)
+
+    def is_revoked(self, claims):
+        token_key, user_key = REVOKED_TOKEN_KEY.format(claims['j']), NOT_BEFORE_KEY.format(claims['u'])
+        entries = cache.get_many([token_key, user_key])
+        not_before = entries.get(user_key)
+        return token_key in entries or (not_before is not None and claims['i'] < not_before)
+
+
+revocations = RevocationList()
+
+
+def create_access_token(user):
+    claims = {'u': user.pk, 'n': user.username, 's': user.is_staff, 'j': secrets.token_hex(8), 'i': _now_ns()}
+    return signing.dumps(claims, salt=ACCESS_SALT, compress=True)
+
+
+def verify_access_token(token):
+    """
+    Return the claims of a valid access token, or raise TokenError
+    """
+    try:
+        claims = signing.loads(token, salt=ACCESS_SALT, max_age=settings.ACCESS_TOKEN_LIFETIME)
+    except signing.SignatureExpired:
+        raise TokenError('Access token expired.')
+    except signing.BadSignature:
+        raise TokenError('Invalid access token.')
+    if revocations.is_revoked(claims):
+        raise TokenError('Access token revoked.')
+    return claims
+
+
+def issue_tokens(user, family=None):
+    """
+    Return a new access and refresh token pair for a user
+    """
+    refresh = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        token_hash=_hash(refresh),
+        family=family or secrets.token_hex(16),
+        expires_at=timezone.now() + timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME),
+    )
+    return {
+        'access': create_access_token(user),
+        'refresh': refresh,
+        'access_expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def signed_tokens(user):
+    """
+    Tokens to add to a login response, when signed tokens are enabled
+    """
+    return issue_tokens(user) if settings.SIGNED_ACCESS_TOKENS else {}
+
+
+def rotate_refresh_token(raw):
+    """
+    Exchange a refresh token for a new token pair, or raise TokenError
+    """
+    with transaction.atomic():
+        token = RefreshToken.objects.select_for_update().select_related('user').filter(token_hash=_hash(raw)).first()
+        if token is None or token.revoked or token.expires_at <= timezone.now() or not token.user.is_active:
+            raise TokenError('Invalid refresh token.')
+        reused = token.used_at is not None
+        if reused:
+            RefreshToken.objects.filter(family=token.family).update(revoked=True)
+        else:
+            token.used_at = timezone.now()
+            token.save(update_fields=['used_at'])
+            tokens = issue_tokens(token.user, family=token.family)
+    # Raised outside the transaction, so the family stays revoked
+    if reused:
+        raise TokenError('Refresh token reused, all tokens of this session are revoked.')
+    return tokens
+
+
+def revoke_refresh_token(raw):
+    """
+    Revoke the family of a refresh token, i.e. log that session out
+    """
+    family = RefreshToken.objects.filter(token_hash=_hash(raw)).values_list('family', flat=True).first()
+    if family is not None:
+        RefreshToken.objects.filter(family=family).update(revoked=True)
+    return family is not None
+
+
+def revoke_access_token(claims):
+    revocations.revoke_token(claims['j'])
+
+
+def revoke_user_tokens(user):
+    """
+    Revoke every access and refresh token issued to a user so far
+    """
+    revocations.revoke_user(user.pk)
+    RefreshToken.objects.filter(user=user, revoked=False).update(revoked=True)
+
+
+def token_user(claims):
+    """
+    Build the user of an access token without a query
+    """
+    return TokenUser.from_db(
+        DEFAULT_DB_ALIAS, ['id', 'username', 'is_staff', 'is_active'], [claims['u'], claims['n'], claims['s'], True]
+    )
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authenticate `Authorization: Bearer <access token>` without a query
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid bearer header.')
+        try:
+            claims = verify_access_token(auth[1].decode())
+        except (TokenError, UnicodeError) as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        return token_user(claims), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
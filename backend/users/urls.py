@@ -1,9 +1,13 @@
 from django.urls import path
-from .views import UserRegistrationView, UserProfileView, ChangePasswordView, CustomLoginView
+from .views import (
+    UserRegistrationView, UserProfileView, ChangePasswordView, CustomLoginView, TokenRefreshView, TokenRevokeView
+)
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
     path('login/', CustomLoginView.as_view(), name='login'),
     path('profile/', UserProfileView.as_view(), name='profile'),
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/revoke/', TokenRevokeView.as_view(), name='token-revoke'),
 ]
@@ -3,8 +3,12 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
+from .login import LoginError, authenticate_login
 from .serializers import UserSerializer, UserRegistrationSerializer, ChangePasswordSerializer
+from .tokens import (
+    TokenError, revoke_access_token, revoke_refresh_token, revoke_user_tokens, rotate_refresh_token, signed_tokens
+)
 
 User = get_user_model()
 
@@ -27,7 +31,8 @@ class UserRegistrationView(generics.CreateAPIView):
         # Return user data and token
         return Response({
             'token': token.key,
-            'user': UserSerializer(user).data
+            'user': UserSerializer(user).data,
+            **signed_tokens(user)
         }, status=status.HTTP_201_CREATED)
 
 class UserProfileView(generics.RetrieveUpdateAPIView):
@@ -54,18 +59,18 @@ class CustomLoginView(APIView):
             return Response({'error': 'Please provide both username and password'},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        user = authenticate(username=username, password=password)
-
-        if not user:
-            return Response({'error': 'Invalid credentials'},
-                            status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            user = authenticate_login(request, username, password)
+        except LoginError as e:
+            return e.response()
 
         token, created = Token.objects.get_or_create(user=user)
         serializer = UserSerializer(user)
 
         return Response({
             'token': token.key,
-            'user': serializer.data
+            'user': serializer.data,
+            **signed_tokens(user)
         })
 
 class ChangePasswordView(generics.UpdateAPIView):
@@ -94,10 +99,45 @@ class ChangePasswordView(generics.UpdateAPIView):
             # Update token after password change
             Token.objects.filter(user=user).delete()
             token, created = Token.objects.get_or_create(user=user)
+            revoke_user_tokens(user)
 
             return Response({
                 "message": "Password updated successfully",
-                "token": token.key
+                "token": token.key,
+                **signed_tokens(user)
             }, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class TokenRefreshView(APIView):
+    """
+    Exchange a refresh token for a new access and refresh token pair
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if not refresh:
+            return Response({'error': 'Please provide a refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(rotate_refresh_token(refresh))
+        except TokenError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+class TokenRevokeView(APIView):
+    """
+    Log a session out: revoke its refresh token family and the access
+    token the request was made with
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if not refresh and not isinstance(request.auth, dict):
+            return Response({'error': 'Please provide a refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+        if refresh and not revoke_refresh_token(refresh):
+            return Response({'error': 'Invalid refresh token.'}, status=status.HTTP_400_BAD_REQUEST)
+        if isinstance(request.auth, dict):
+            revoke_access_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -50,6 +50,8 @@ export const authService = {
   getProfile: () => api.get('/users/profile/'),
   updateProfile: (userData) => api.put('/users/profile/', userData),
   changePassword: (passwordData) => api.put('/users/change-password/', passwordData),
+  refreshToken: (refresh) => api.post('/users/token/refresh/', { refresh }),
+  revokeToken: (refresh) => api.post('/users/token/revoke/', { refresh }),
   logout: () => {
     localStorage.removeItem('token');
     delete api.defaults.headers.Authorization;
@@ -65,7 +67,9 @@ export const topicService = {
 
 // Progress services
 export const progressService = {
+  getProgressMap: () => api.get('/progress/'),
   updateProgress: (contentId, completed) => api.post(`/progress/content/${contentId}/`, { completed }),
+  bulkUpdateProgress: (items) => api.post('/progress/bulk/', items),
   getOverallProgress: () => api.get('/progress/overall/'),
 };
 
@@ -78,8 +82,11 @@ export const adminService = {
   getDashboard: () => api.get('/admin/dashboard/'),
 
   // Users
-  getUsers: () => api.get('/admin/users/'),
+  // Cursor-paginated; pass { search, is_active, is_staff, page_size } or follow `next`
+  getUsers: (params = {}) => api.get('/admin/users/', { params }),
   getUserStats: () => api.get('/admin/user-stats/'),
+  // params: { series: 'registrations,completions,active_users', bucket: 'day'|'week'|'month', days }
+  getAnalytics: (params = {}) => api.get('/admin/analytics/', { params }),
 
   // Topics
   getAdminTopics: () => api.get('/admin/topics/'),